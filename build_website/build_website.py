@@ -4,11 +4,16 @@ Module for building the HowsMyNHS website
 
 # standard python packages
 import numpy as np
+import os
+import json
 from datetime import date
+from functools import lru_cache
 
 # local packages
 import build_website.news as news
 import build_website.process_data as pd
+from build_website.figure_cache import make_key
+from build_website.workers import workerPool
 
 str2num = np.vectorize(float)
 intvec = np.vectorize(int)
@@ -44,7 +49,7 @@ def format_number(num):
         num = int(np.round(num / 100.0)) * 100
         out = "{:,}".format(num)
     else:
-        out = "{}".format(num)
+        out = "{}".format(pd.whole_number(num))
     return out
 
 def get_names(data_file, output = False):
@@ -57,41 +62,28 @@ def get_names(data_file, output = False):
 
 
 
-def makeURL(name):
-    url_prefix = '-'.join(name.lower().split(' '))
-    url = ''.join(["hospitals/",url_prefix,".html"])
-    url = url.replace(',', '') 
+def makeURL(slug):
+    '''Page of the trust with slug, see TrustRegistry.slugs'''
+    url = ''.join(["hospitals/", slug, ".html"])
     return url
     
     
-def MakeHomepage(waiting_data, bed_data):
+def MakeHomepage(data):
     print("Building homepage...", end = " ")
-    
-    # Load data
-    names1, _, _, waiting = np.load(waiting_data, allow_pickle=True)
-    names2, _, beds = np.load(bed_data, allow_pickle=True)
-    names2 = pd.capitaliseFirst(names2)
-    
-    allNames = pd.combineNames(names1, names2)
-    #print(type(allNames[0]))
-    # Make list of hospital names
+
+    summary = data.summary
+
+    # Make list of hospital names (names only in the covid data have no
+    # A&E or bed data, so aren't listed)
     hospitalLinksList = []
-    for i, name in enumerate(allNames):
+    for i, name in enumerate(data.all_names):
+        trust = summary[name]
         # Check if the trust is in contained in the values of merged_trust
         # i.e. is it an old trust which has since merged into something else.
-        oldTrust = name in pd.get_all_dict_values(mergered_trusts)
-        if not oldTrust:
-            ane_points, bed_points = 0, 0
-            merged = name in mergered_trusts.keys()
-            
-            if name in names1:
-                ane_points = len(waiting[names1 == name][waiting[names1 == name] != '-'])
-                
-            if name in names2:
-                bed_points = len(beds[names2 == name][beds[names2 == name] != '-'])
+        if not trust["old_trust"]:
             
-            if ane_points >= 10 or bed_points>= 4 or merged:
-                url = makeURL(name)
+            if trust["ane_points"] >= 10 or trust["bed_points"]>= 4 or trust["merged"]:
+                url = makeURL(data.registry.slugs[name])
                 hospitalLinksList.append("<li><a href=\"{}\">{}</a></li>\n".format(url,name))
 
     hospitalLinks = ''.join(hospitalLinksList)
@@ -103,36 +95,38 @@ def MakeHomepage(waiting_data, bed_data):
     
     print("Done")
     
-def make_AnE_waiting_block(data, name):
+def chartHTML(slug, kind, alt, charts = "svg"):
+    '''
+    HTML of the kind chart of the trust with slug.
+
+    Parameters
+    ----------
+    charts : string
+        "svg" for the chart's SVG file, or "client" for a placeholder
+        which scripts/charts.js draws the chart into from the trust's
+        chart data, see chart_data.writeChartData.
+    '''
+    if charts == "client":
+        src = "../figures/{}".format(pd.makeFigureName(slug, "charts", "json"))
+        return "<center><div class=\"chart\" data-src=\"{}\" data-chart=\"{}\" " \
+            "role=\"img\" aria-label=\"{}\"></div></center>".format(src, kind, alt)
+    elif charts != "svg":
+        raise ValueError("Unknown chart mode: {}".format(charts))
+    
+    figName = pd.makeFigureName(slug, kind, "svg")
+    path = "../figures/{}".format(figName)
+    return "<center><img src=\"{}\" alt=\"{}\"></center>".format(path, alt)
+
+def make_AnE_waiting_block(data, name, charts = "svg"):
     ''' Generates the chunk of HTML relating to the A&E waiting time data for NHS trust <name>.
     '''
-    names, dates, attendance, waiting = np.load(data, allow_pickle=True)
-    dates = pd.dates2num(dates)
-    i = np.where(names == name)[0][0]
-    
-    
-    if name not in mergered_trusts.keys():
-        attendanceData = attendance[i,:]
-        waitingData = waiting [i,:]
-    else:
-        # Combine merged trust data
-        attendanceData, _ = pd.combineAnEData(attendance, 
-                                              names,
-                                              name,
-                                              mergered_trusts)
-        waitingData, _ = pd.combineAnEData(waiting, 
-                                           names, 
-                                           name,
-                                           mergered_trusts)
+    # Summary of the trust's (or merged trusts') data
+    trust = data.summary[name]
+    i = data.waiting.rows.get(name)
         
     if i == 0:
-        # Get figure path
-        figName = pd.makeFigureName(name, "waiting", "svg")
-        path = "../figures/{}".format(figName)
-
-        
-        imgHTML = "<center><img src=\"{}\" alt=\"{}\"></center>".format(path,
-             "A&E waiting data for all of England.")
+        imgHTML = chartHTML(data.registry.slugs[name], "waiting",
+             "A&E waiting data for all of England.", charts)
         supTextHTML = u'''
 
             <p>After nearly a decade of Conservative rule, in December over <b>500,000</b> more people were made to wait
@@ -147,22 +141,17 @@ def make_AnE_waiting_block(data, name):
 
         chunk = supTextHTML.format(imgHTML, brexit_et_al)
         
-    elif sum(attendanceData != '-')>=10:
-        # Get figure path
-        figName = pd.makeFigureName(name, "waiting", "svg")
-        path = "../figures/{}".format(figName)
-        
-        imgHTML = "<center><img src=\"{}\" alt=\"{}\"></center>".format(path,
-             "A&E waiting data for {} - Number of people waiting over four hours each month.".format(name))
+    elif trust["att_points"]>=10:
+        imgHTML = chartHTML(data.registry.slugs[name], "waiting",
+             "A&E waiting data for {} - Number of people waiting over four hours each month.".format(name),
+             charts)
         
-        smoothWait = pd.movingAverage(waitingData[waitingData != '-'])
-        avAtt = np.mean(attendanceData[attendanceData != '-'])
-        #print(waiting[i,:] != '-')
-        #print(dates)
-        sampleDates = dates[waitingData != '-']
-        diff = smoothWait[0]-smoothWait[-1]
+        maxSmoothWait = trust["smooth_max"]
+        avAtt = trust["av_attendance"]
+        firstDate = trust["first_year"]
+        diff = trust["smooth_diff"]
         
-        if max(smoothWait) < 15 and avAtt<2000:
+        if maxSmoothWait < 15 and avAtt<2000:
             chunk = '''
             <!--Minimal Change Hospital + less than 2000 monthy attendance-->
 
@@ -176,9 +165,9 @@ def make_AnE_waiting_block(data, name):
 
             {}
             
-            '''.format(int(avAtt), int(round(min(sampleDates))), imgHTML, brexit_et_al)
+            '''.format(int(avAtt), int(round(firstDate)), imgHTML, brexit_et_al)
 
-        elif max(smoothWait) < 15:
+        elif maxSmoothWait < 15:
             chunk = '''
             <!--Minimal Change Hospital + more than 2000 monthy attendance-->
 
@@ -193,7 +182,6 @@ def make_AnE_waiting_block(data, name):
             '''.format(imgHTML, brexit_et_al)
 
         elif avAtt>2000 and diff > 100:
-            diff = smoothWait[0]-smoothWait[-1]
             chunk = '''
             <p>After nearly a decade of Conservative rule, on average, <b>{}</b> more people each month are being left to wait over 
             four hours at A&E at <b>your</b> hospital than back in {}.</p>
@@ -205,7 +193,7 @@ def make_AnE_waiting_block(data, name):
 
             {}
             
-            '''.format(int(diff),int(np.floor(min(sampleDates))), imgHTML, brexit_et_al)
+            '''.format(int(diff),int(np.floor(firstDate)), imgHTML, brexit_et_al)
         elif diff < 100:
             #print(name)
             chunk = '''
@@ -224,7 +212,7 @@ def make_AnE_waiting_block(data, name):
 
              {}
 
-            '''.format(abs(int(diff)), int(np.floor(min(sampleDates))), imgHTML, brexit_et_al)
+            '''.format(abs(int(diff)), int(np.floor(firstDate)), imgHTML, brexit_et_al)
         else:
             #print(name)
             chunk = '''
@@ -242,7 +230,7 @@ def make_AnE_waiting_block(data, name):
 
              {}
             
-            '''.format(int(diff), int(np.floor(min(sampleDates))), imgHTML, brexit_et_al)
+            '''.format(int(diff), int(np.floor(firstDate)), imgHTML, brexit_et_al)
     else:
         print("Error: Trust \"{}\" doesn't quite fit.".format(name))
         chunk = "<p> Error: Please contact website administrator. </p>"
@@ -251,44 +239,27 @@ def make_AnE_waiting_block(data, name):
     
 
 
-def make_bed_block(beds_data, name):
+def make_bed_block(data, name, charts = "svg"):
     ''' Generates the chunk of HTML relating to the A&E waiting time data for NHS trust <name>.
 
     '''
-    names, dates, beds = np.load(beds_data, allow_pickle=True)
+    i = data.beds.rows.get(name)
     
-    names = pd.capitaliseFirst(names)
+    imgHTML = chartHTML(data.registry.slugs[name], "beds",
+                    "Number of available overnight beds for {}.".format(name),
+                    charts)
     
-    i = np.where(names == name)[0]
+    # National figures, the same on every page
+    national = data.bed_stats
+    england_bed_change = national.england_change
+    england_bed_change_perc = national.england_change_perc
+    trusts_with_more, trust_with_fewer = national.more, national.fewer
     
-    figName = pd.makeFigureName(name, "beds", "svg")
-    path = "../figures/{}".format(figName)
-    imgHTML = "<center><img src=\"{}\" alt=\"{}\"></center>".format(path, 
-                    "Number of available overnight beds for {}.".format(name))
-    
-    england_bed_change = beds[0][-1] - beds[0][0]
-    england_bed_change_perc = (beds[0][-1] - beds[0][0])/beds[0][0]*100
-    
-    trusts_with_more, _, trust_with_fewer = pd.bed_change_per_trust(names, 
-                                                                    beds,
-                                                                    mergered_trusts)
-    
-    # Calculate fractional change
-    if name not in mergered_trusts.keys():
-        mask = beds[i][0] != "-"
-        num_change = beds[i][0][mask][0] - beds[i][0][mask][-1]
-        change = num_change/beds[i][0][mask][-1]
-    else:
-        # Combine merged trust data
-        totalBeds = pd.combineBedData(beds,
-                                      names, 
-                                      name, 
-                                      mergered_trusts)
-        mask = totalBeds != "-"
-        
-        # calculate change
-        num_change = totalBeds[mask][0] - totalBeds[mask][-1]  
-        change = num_change/totalBeds[mask][-1]
+    # Calculate fractional change (using combined data for merged trusts)
+    trust = data.summary[name]
+    num_change = trust["beds_newest"] - trust["beds_oldest"]
+    change = num_change/trust["beds_oldest"]
+    start_date = int(np.floor(trust["beds_start"]))
     
     if i == 0:
 
@@ -297,7 +268,6 @@ def make_bed_block(beds_data, name):
            int(trusts_with_more), brexit_et_al)
         
     elif change < -0.05 and change > -1:
-        start_date = int(np.floor(dates[mask][-1]))
         percentage_change = abs(change)*100
        
         chunk = beds_worse.format(name, format_number(-num_change), start_date, 
@@ -307,14 +277,12 @@ def make_bed_block(beds_data, name):
         
     elif change == -1:
         # All of the beds are gone
-        start_date = int(np.floor(dates[mask][-1]))
         chunk = beds_all_gone.format(name, format_number(-num_change), 
                 start_date, imgHTML, england_bed_change, 
            int(england_bed_change_perc), int(trust_with_fewer),
            int(trusts_with_more), brexit_et_al)
     elif change > 0.05:
         # Things are better
-        start_date = int(np.floor(dates[mask][-1]))
         chunk = beds_better.format(name, int(trusts_with_more), start_date, 
                 format_number(num_change), imgHTML,england_bed_change, 
            int(england_bed_change_perc), int(trust_with_fewer),
@@ -324,8 +292,6 @@ def make_bed_block(beds_data, name):
         # Not much change
         #print(name)
         
-        start_date = int(np.floor(dates[mask][-1]))
-        
         if num_change>1:
             more_or_less = "{} more beds".format(format_number(abs(num_change)))
         elif num_change == 1:
@@ -343,28 +309,26 @@ def make_bed_block(beds_data, name):
         
     return chunk   
 
-def makeCovidBlock(covid_data, name):
-    names, dates, covid_deaths = np.load(covid_data, allow_pickle=True)
-    names = pd.capitaliseFirst(names)
-    #print(name, covid_deaths[names == name].shape)
+def makeCovidBlock(data, name, charts = "svg"):
+    names, dates, covid_deaths = data.covid
+    rows = data.covid.rows
     
-    englandDeaths = covid_deaths[names == "England"][0]
-    totalEnglandDeaths = sum(englandDeaths)
-    weeksEnglandDeaths = sum(englandDeaths[-7::])
+    englandDeaths = covid_deaths[rows["England"]]
+    totalEnglandDeaths = np.sum(englandDeaths)
+    weeksEnglandDeaths = np.sum(englandDeaths[-7::])
                            
-    trustDeaths = covid_deaths[names == name][0]
-    totalTrustDeaths = sum(trustDeaths)
-    weeksTrustDeaths = sum(trustDeaths[-7::])
+    trustDeaths = covid_deaths[rows[name]]
+    totalTrustDeaths = np.sum(trustDeaths)
+    weeksTrustDeaths = np.sum(trustDeaths[-7::])
     
     # were/was and death/deaths
-    were_was = "were"*(trustDeaths[-1] != 1) + "was"*(trustDeaths[-1] == 1)
-    death_deaths = "death" + "s"*(trustDeaths[-1] != 1)
+    were_was = "were"*bool(trustDeaths[-1] != 1) + "was"*bool(trustDeaths[-1] == 1)
+    death_deaths = "death" + "s"*bool(trustDeaths[-1] != 1)
     
     # image html
-    figName = pd.makeFigureName(name, "covid", "svg")
-    path = "../figures/{}".format(figName)
-    imgHTML = "<center><img src=\"{}\" alt=\"{}\"></center>".format(path, 
-                    "Number of Covid-19 related deaths for {}.".format(name))
+    imgHTML = chartHTML(data.registry.slugs[name], "covid",
+                    "Number of Covid-19 related deaths for {}.".format(name),
+                    charts)
     
     # todays date
     todayDate = date.today()
@@ -424,62 +388,28 @@ def makeCovidBlock(covid_data, name):
     
     return chunk
 
-def whichChunks(name, ane_names, bed_names, covid_names, all_waiting, all_beds, all_covid):
-    '''Determins which HTML chunks are needed 
-    
+def whichChunks(name, data):
+    '''Determins which HTML chunks are needed
+
     Returns: Boolian array
         - A&E Needed
         - Beds Needed
     '''
-    ane_block, bed_block, covid_block = False, False, False
-    
-    # Check if A&E block is needed
-    if name in ane_names:
-        attendence = all_waiting[ane_names == name]
-        ane_points = len(attendence[attendence != "-"])
-        if ane_points >= 10:
-            ane_block = True
-    # if trust is made from merger, check the old trusts
-    if name in mergered_trusts.keys():
-        for oldTrust in mergered_trusts[name]:
-            if oldTrust in ane_names:
-                attendence = all_waiting[ane_names == oldTrust]
-                #print(oldTrust, attendence)
-                ane_points = len(attendence[attendence != "-"])
-                if ane_points >= 10:  
-                    ane_block = True
-                    #print("merged A&E block added")
-                    
-    # Check if Bed block is needed
-    if name in bed_names:
-        beds = all_beds[bed_names == name]
-        bed_points = len(beds[beds != "-"])
-        if bed_points >= 4:
-            bed_block = True
-            
-    # if trust is made from merger, check the old trusts
-    if name in mergered_trusts.keys():
-        for oldTrust in mergered_trusts[name]:
-            if oldTrust in bed_names:
-                beds = all_beds[bed_names == oldTrust]
-                #print(oldTrust, beds)
-                bed_points = len(beds[beds != "-"])
-                if bed_points >= 4:
-                    bed_block = True
-                    #print("merged bed block added: {}".format(name))
-                    
-    if name in covid_names:
-        covid_block = True
-            
-    return ane_block, bed_block, covid_block
+    if name not in data.summary:
+        return False, False, False
+
+    # merged trusts get a block if any of the old trusts had one
+    trust = data.summary[name]
+    return (bool(trust["ane_block"]), bool(trust["bed_block"]),
+            bool(trust["covid_block"]))
     
-def generate_meta(name, AnEblock, bedblock):
+def generate_meta(name, slug, AnEblock, bedblock):
     '''Creates meta HTML for given trust page'''
     
     meta_desc = '''A&E waiting times have risen and the number of available overnight beds has fallen. Now, thousands of lives have been lost to Covid-19. Find out here out {} is doing.'''.format(name)
         
 
-    meta_image = "https://howsmynhs.co.uk/figures/og/" + pd.makeFigureName(name, "og", "png")
+    meta_image = "https://howsmynhs.co.uk/figures/og/" + pd.makeFigureName(slug, "og", "png")
     
     if name == "England":
         subTitle = "NHS England Overview"
@@ -488,7 +418,7 @@ def generate_meta(name, AnEblock, bedblock):
     
     meta_title = "How's my NHS? - " + subTitle + " [Official Data]"
     
-    meta_url = "https://howsmynhs.co.uk/" + makeURL(name)
+    meta_url = "https://howsmynhs.co.uk/" + makeURL(slug)
     
     meta_HTML = '''\t<meta name="description" content="{}" />
     <!--  General META Tags -->
@@ -516,74 +446,184 @@ def generate_meta(name, AnEblock, bedblock):
     
     return meta_HTML
 
-def build_trust_pages(waiting_data, beds_data, covid_data, news_file):
+def build_trust_pages(data, news_file, cache_dir = None, charts = "svg",
+                      jobs = 1, manifest = None):
+    '''
+    Writes the page of every trust.
+
+    Parameters
+    ----------
+    data : DataContext
+        All of the datasets. Shared with the workers without copying
+        where the platform can fork, see workers.workerPool.
+    charts : string
+        See chartHTML.
+    jobs : int
+        Number of worker processes writing the pages, None for one per
+        CPU. With 1 the pages are written in this process. The pages are
+        the same either way.
+    manifest : BuildManifest
+        Keys of the pages written by earlier builds, see pageKey. A page
+        whose inputs haven't changed is neither made nor written again.
+        None to write every page.
+    '''
     print("Building trust pages...", end = " ")
-    
-    # Load data
-    names1, dates, attendance, waiting = np.load(waiting_data, allow_pickle=True)
-    names2, dates, beds = np.load(beds_data, allow_pickle=True)
-    names3, dates, covid_deaths = np.load(covid_data, allow_pickle=True)
-    
-    # Format and combine all names
-    names2 = pd.capitaliseFirst(names2)
-    names3 = pd.capitaliseFirst(names3)
-    allNames = pd.combineNames(names1, names2)
-    allNames = pd.combineNames(allNames, names3)
+
+    allNames = data.all_names
     
     # Load news
-    newsDict = news.makeNewsDictionary(allNames,news_file)
+    newsDict = news.makeNewsDictionary(allNames, news_file, cache_dir)
     
     # list of old trusts
     oldTrusts = pd.get_all_dict_values(mergered_trusts)
-    for i, name in enumerate(allNames):
-        
-        #print(name)
-        AnEblock, bedblock, covidblock = whichChunks(name, names1, names2, 
-                                                     names3, waiting, beds, covid_deaths)
-        
-        if (AnEblock or bedblock or covidblock) and (name not in oldTrusts):
-            
-            url = makeURL(name)
-            file = open(url, "w")
-            
-            if name == "England":
-                subTitle = "NHS England Overview"
-            else:
-                subTitle = name
-            
-            meta_HTML = generate_meta(name, AnEblock, bedblock)
-                        
-            subTitleHTML = '''
-            <div class = \"box\">
-            \n<h2 class = \"subtitle\">{}</h2>\n'''.format(subTitle)
-            
-            
-            tab_HTML = '<div class="tab">' + \
-            "<button class=\"tablinks\" onclick=\"openCity(event, 'AnE')\" id=\"defaultOpen\">A&E</button>"*AnEblock + \
-            "<button class=\"tablinks\" onclick=\"openCity(event, 'beds')\" id=\"defaultOpen\">Beds</button>"*bedblock + \
-            "<button class=\"tablinks\" onclick=\"openCity(event, 'covid')\" id=\"defaultOpen\">Covid-19</button>"*covidblock + \
-            "<button class=\"tablinks\" onclick=\"openCity(event, 'news')\" id=\"defaultOpen\">News</button></div>" 
-            
-            
-            supTextHTML = ""
-            
-            if AnEblock:
-                supTextHTML += "<div id=\"AnE\" class=\"tabcontent\">" + make_AnE_waiting_block(waiting_data, name) + "</div>\n"
-            
-            if bedblock:
-                supTextHTML += "<div id=\"beds\" class=\"tabcontent\">" + make_bed_block(beds_data, name) + "</div>\n"
-            if covidblock:
-                supTextHTML += "<div id=\"covid\" class=\"tabcontent\">" + makeCovidBlock(covid_data, name) + "</div>\n"
-                
-            supTextHTML += news.makeNewsBlock(name, newsDict)
-            
-            supTextHTML += "</div>\n"
-            
-            file.write(''.join([headHTML1,headHTML2.format(name, meta_HTML),subTitleHTML,tab_HTML,
-                                supTextHTML,footer2, tab_script]))
-            file.close() 
+    # a few names share a URL, only the page of the last one is kept as
+    # it would overwrite the others
+    pages = {}
+    for name in allNames:
+        blocks = whichChunks(name, data)
+        if any(blocks) and (name not in oldTrusts):
+            pages[makeURL(data.registry.slugs[name])] = (name, blocks)
+    pages = list(pages.values())
+
+    if jobs is None:
+        jobs = os.cpu_count()
+
+    if jobs <= 1 or len(pages) <= 1:
+        outputs = [writeTrustPage(page, data, newsDict, charts, manifest)
+                   for page in pages]
+    else:
+        data.prepare()
+        with workerPool(jobs, initPageWorker,
+                        (data, newsDict, charts, manifest)) as pool:
+            outputs = pool.map(writePage, pages,
+                               chunksize = max(1, len(pages)//(4*jobs)))
+
+    if manifest is not None:
+        written = 0
+        for url, key, write in outputs:
+            manifest.update(url, key)
+            written += write
+        manifest.record("trust pages", written, len(outputs) - written)
     print("Done.")
-    
+
+def writeTrustPage(page, data, newsDict, charts = "svg", manifest = None):
+    '''
+    Writes the page of (name, blocks), see trustPage. With a manifest,
+    the page isn't made if its key is the same as the last build's.
+
+    Returns
+    -------
+    url : string
+        The page's file.
+    key : string
+        See pageKey, None without a manifest.
+    write : bool
+        Whether the page was written.
+    '''
+    name, blocks = page
+    url = makeURL(data.registry.slugs[name])
+    key = None
+    if manifest is not None:
+        key = pageKey(data, name, blocks, newsDict, charts)
+        if manifest.fresh(url, key):
+            return url, key, False
+    with open(url, "w") as file:
+        file.writelines(trustPage(data, name, blocks, newsDict, charts))
+    return url, key, True
+
+@lru_cache(maxsize = None)
+def pageVersion(charts):
+    '''sha1 of the code and the template text the trust pages are made
+    from in the charts mode'''
+    parts = [charts, *trust_head, *tab_buttons.values(), *tab_content,
+             trust_tails[charts]]
+    folder = os.path.dirname(__file__)
+    for module in [__file__, os.path.join(folder, "news.py"),
+                   os.path.join(folder, "summary.py")]:
+        with open(module, "rb") as file:
+            parts.append(file.read())
+    return make_key(*parts)
+
+def pageKey(data, name, blocks, newsDict, charts = "svg"):
+    '''
+    Key of the page of trust name in the manifest: everything the page is
+    made from, so that it can be skipped without making it. That is the
+    trust's summary and predecessors, its news, the national bed and
+    covid figures and pageVersion. Today's date isn't part of it, so the
+    covid block's "Last updated" is the day its figures last changed.
+    '''
+    national = data.bed_stats
+    parts = [pageVersion(charts), name, repr(blocks),
+             data.summary[name].tobytes(),
+             repr(mergered_trusts.get(name, [])),
+             json.dumps(newsDict[name], sort_keys = True, default = str),
+             repr([national.more, national.same, national.fewer,
+                   national.england_change, national.england_change_perc])]
+    if blocks[2]:
+        deaths, rows = data.covid[2], data.covid.rows
+        parts += [deaths[rows["England"]], deaths[rows[name]]]
+    return make_key(*parts)
+
+def initPageWorker(data, newsDict, charts, manifest):
+    global worker_data, worker_news, worker_charts, worker_manifest
+    worker_data = data
+    worker_news = newsDict
+    worker_charts = charts
+    worker_manifest = manifest
+
+def writePage(page):
+    return writeTrustPage(page, worker_data, worker_news, worker_charts,
+                          worker_manifest)
+    
+def fillTemplate(parts, *values):
+    '''Generator of the static parts of a template made by compileTemplate
+    with the values of its fields in between'''
+    yield parts[0]
+    for value, part in zip(values, parts[1:]):
+        yield value
+        yield part
+
+def trustPage(data, name, blocks, newsDict, charts = "svg"):
+    '''
+    Generator of the HTML of the page of trust name, in the order it is
+    written. Only the parts which change from page to page are made for
+    each page, the rest is put together once in trust_head, tab_buttons
+    and trust_tails.
+
+    Parameters
+    ----------
+    blocks : tuple
+        (AnEblock, bedblock, covidblock) from whichChunks.
+    newsDict : dict
+        See news.makeNewsDictionary.
+    charts : string
+        See chartHTML.
+    '''
+    AnEblock, bedblock, covidblock = blocks
+    if name == "England":
+        subTitle = "NHS England Overview"
+    else:
+        subTitle = name
+
+    yield from fillTemplate(trust_head, name,
+                            generate_meta(name, data.registry.slugs[name],
+                                          AnEblock, bedblock), subTitle)
+
+    tabs = [("AnE", AnEblock, make_AnE_waiting_block),
+            ("beds", bedblock, make_bed_block),
+            ("covid", covidblock, makeCovidBlock)]
+    for tab, block, _ in tabs:
+        if block:
+            yield tab_buttons[tab]
+    yield tab_buttons["news"]
+
+    for tab, block, makeBlock in tabs:
+        if block:
+            yield from fillTemplate(tab_content, tab,
+                                    makeBlock(data, name, charts))
+    yield news.makeNewsBlock(name, newsDict)
+    yield trust_tails[charts]
+
 ####################################################################################################
 ###########################################  Website JS  ########################################### 
 ####################################################################################################
@@ -608,6 +648,9 @@ function openCity(evt, cityName) {
 document.getElementById("defaultOpen").click();
 </script>'''
 
+# draws the charts of the trust pages from their chart data, see chartHTML
+chart_script = '''\n<script src="../scripts/charts.js"></script>'''
+
 ####################################################################################################
 ########################################### Website Text ########################################### 
 ####################################################################################################
@@ -807,6 +850,45 @@ footer2 = '''
 </html>
 '''
 
+def compileTemplate(*templates):
+    '''
+    Static parts of the templates joined end to end, either side of their
+    {} fields, so that the text around the fields is only put together
+    once rather than for every page.
+
+    Returns
+    -------
+    parts : list
+        Strings, one more than the number of fields. See fillTemplate.
+    '''
+    parts = [""]
+    for template in templates:
+        first, *rest = template.split("{}")
+        parts[-1] += first
+        parts += rest
+    return parts
+
+subTitleHTML = '''
+            <div class = \"box\">
+            \n<h2 class = \"subtitle\">{}</h2>\n'''
+
+# fields: name, meta data and subtitle
+trust_head = compileTemplate(headHTML1, headHTML2, subTitleHTML,
+                             '<div class="tab">')
+
+tab_button = "<button class=\"tablinks\" onclick=\"openCity(event, '{}')\" id=\"defaultOpen\">{}</button>"
+tab_buttons = {"AnE": tab_button.format("AnE", "A&E"),
+               "beds": tab_button.format("beds", "Beds"),
+               "covid": tab_button.format("covid", "Covid-19"),
+               "news": tab_button.format("news", "News") + "</div>"}
+
+# fields: tab and block
+tab_content = compileTemplate("<div id=\"{}\" class=\"tabcontent\">{}</div>\n")
+
+# closes the box div after the news block, for each chart mode
+trust_tails = {"svg": "</div>\n" + footer2 + tab_script,
+               "client": "</div>\n" + footer2 + tab_script + chart_script}
+
 tailHTML = '''
 </body>
 </html>'''
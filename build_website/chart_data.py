@@ -0,0 +1,139 @@
+'''
+Chart data for drawing the trust charts in the browser
+
+Writes one small JSON file per trust page with the specs of its charts
+(see svg_charts.chartSpec), which scripts/charts.js draws as SVG in the
+page. Pages built with build_trust_pages(..., charts = "client") load
+these instead of a pre-rendered SVG per chart, so no chart is drawn with
+matplotlib for the trust pages.
+'''
+
+import json
+import numpy as np
+
+# local packages
+import build_website.process_data as proc
+import build_website.svg_charts as svg_charts
+from build_website.figure_cache import make_key
+from build_website.build_website import mergered_trusts, whichChunks
+
+# significant figures of the plotted values, and decimal places of the
+# dates (years, or whole days for covid) and of the chart layout
+value_figures = 4
+date_decimals = 3
+layout_decimals = 1
+
+def rounded(values, decimals = None, figures = None):
+    '''List of the values rounded to decimals places or figures
+    significant figures, with whole numbers as ints'''
+    out = []
+    for value in np.atleast_1d(np.asarray(values, dtype = float)):
+        if figures is not None:
+            value = float("{:.{}g}".format(value, figures))
+        else:
+            value = round(value, decimals)
+        out.append(int(value) if value.is_integer() else value)
+    return out
+
+def jsonSpec(spec):
+    '''A chart spec with its arrays as short lists of numbers'''
+    frames = []
+    for frame in spec["frames"]:
+        layers = []
+        for layer in frame["layers"]:
+            layer = dict(layer)
+            layer["x"] = rounded(layer["x"], date_decimals)
+            for key in ["y", "height"]:
+                if key in layer:
+                    layer[key] = rounded(layer[key], figures = value_figures)
+            if "bottom" in layer and np.ndim(layer["bottom"]):
+                layer["bottom"] = rounded(layer["bottom"],
+                                          figures = value_figures)
+            layers.append(layer)
+        frame = dict(frame, layers = layers)
+        frame["box"] = rounded(frame["box"], layout_decimals)
+        frame["xlim"] = rounded(frame["xlim"], date_decimals)
+        frame["ylim"] = rounded(frame["ylim"], figures = value_figures + 2)
+        frame["yticks"] = rounded(frame["yticks"], figures = value_figures + 2)
+        frames.append(frame)
+
+    spec = dict(spec, frames = frames)
+    spec["xaxis"] = dict(spec["xaxis"],
+                         ticks = rounded(spec["xaxis"]["ticks"], date_decimals))
+    if "breaks" in spec:
+        spec["breaks"] = rounded(spec["breaks"], layout_decimals)
+    return spec
+
+def trustCharts(name, data):
+    '''
+    Specs of the charts shown on the page of trust name.
+
+    Returns
+    -------
+    charts : dict
+        JSON ready spec of each chart kind.
+    failures : list
+        (kind, error) of each chart which couldn't be made.
+    '''
+    blocks = zip(["waiting", "beds", "covid"], whichChunks(name, data))
+    charts, failures = {}, []
+    for kind, block in blocks:
+        if not block:
+            continue
+        try:
+            charts[kind] = jsonSpec(svg_charts.chartSpec(kind, name, data))
+        except Exception as error:
+            failures.append((kind, "{}: {}".format(type(error).__name__, error)))
+    return charts, failures
+
+def writeChartData(data, folder = "figures", manifest = None):
+    '''
+    Writes the chart data of every trust page to
+    <folder>/<trust>-charts.json. With a BuildManifest, a file which is
+    the same as the last build's isn't written again.
+
+    Returns
+    -------
+    failures : list
+        (kind, name, error) of each chart which couldn't be made.
+    '''
+    print("Writing chart data...", end = " ")
+
+    oldTrusts = proc.get_all_dict_values(mergered_trusts)
+    failures = []
+    written = skipped = 0
+    # a few names share a file, only the last one's data is kept as it
+    # would overwrite the others
+    paths = {}
+    for name in data.all_names:
+        if name in oldTrusts or not any(whichChunks(name, data)):
+            continue
+        slug = data.registry.slugs[name]
+        paths["{}/{}".format(folder, proc.makeFigureName(slug, "charts", "json"))] = name
+
+    for path, name in paths.items():
+        charts, errors = trustCharts(name, data)
+        failures += [(kind, name, error) for kind, error in errors]
+
+        text = json.dumps(charts, separators = (",", ":"))
+        if manifest is not None:
+            key = make_key(text)
+            if manifest.fresh(path, key):
+                skipped += 1
+                continue
+        with open(path, "w") as file:
+            file.write(text)
+        if manifest is not None:
+            manifest.update(path, key)
+        written += 1
+
+    if manifest is not None:
+        manifest.record("chart data", written, skipped)
+
+    if failures:
+        print("\n{} chart(s) failed:".format(len(failures)))
+        for kind, name, error in failures:
+            print("    {} ({}): {}".format(name, kind, error))
+
+    print("Done.")
+    return failures
@@ -0,0 +1,325 @@
+'''
+Loading the NHS datasets used to build the website
+
+Each dataset can either be one of the original pickled .npy files or a
+directory written by write_store. A store holds the names, the dates and
+each value matrix in separate, non-pickled .npy files so that the values
+can be memory-mapped rather than unpickled on every load:
+
+    <store>/names.npy       trust names (unicode)
+    <store>/dates.npy       date axis (unicode, float or datetime64)
+    <store>/<field>.npy     float64 matrix, one row per name
+'''
+
+import os
+import numpy as np
+
+# local packages
+import build_website.process_data as proc
+import build_website.rolling as rolling
+from build_website.registry import load_registry
+from build_website.summary import summarise, national_beds
+from build_website.build_website import mergered_trusts
+
+class Dataset(tuple):
+    '''
+    A dataset tuple [names, dates, *values] which also holds the row of
+    each name, so that a trust's data can be found in constant time with
+    dataset.rows[name], the combined data of the merged trusts and the
+    parsed date axis, dataset.axis (see process_data.TimeAxis).
+    '''
+
+    def __new__(cls, names, dates, *values, rows = None, mergers = None):
+        dataset = super().__new__(cls, (names, dates, *values))
+        if rows is None:
+            rows = proc.name_index(names)
+        dataset.rows = rows
+        dataset.axis = proc.TimeAxis(dates)
+        dataset.mergers = mergers or {}
+        dataset.merge_matrix = None
+        dataset.merged_data = {}
+        dataset.combined_data = {}
+        dataset.smoothed_data = {}
+        return dataset
+
+    def __getnewargs_ex__(self):
+        # tuple's pickling would pass the whole tuple as one argument to
+        # __new__. The cached data is restored from __dict__ afterwards.
+        return tuple(self), {"rows": self.rows, "mergers": self.mergers}
+
+    def merged(self, field, all_old = False):
+        '''
+        Combined data of every merged trust for the value matrix
+        dataset[field], made once and then reused for the rest of the
+        build. See process_data.MergeMatrix.combine.
+
+        Returns
+        -------
+        merged : dict
+            (combined data, mask) for each merged trust.
+        '''
+        key = (field, all_old)
+        if key not in self.merged_data:
+            if self.merge_matrix is None:
+                self.merge_matrix = proc.MergeMatrix(self.mergers, self.rows)
+            self.merged_data[key] = self.merge_matrix.combine(self[field],
+                                                              all_old)
+        return self.merged_data[key]
+
+    def combined(self, field, all_old = False):
+        '''Copy of dataset[field] with the rows of merged trusts replaced by
+        their combined data'''
+        key = (field, all_old)
+        if key not in self.combined_data:
+            values = np.array(self[field], dtype = np.float64)
+            for name, (totals, _) in self.merged(field, all_old).items():
+                values[self.rows[name]] = totals
+            self.combined_data[key] = values
+        return self.combined_data[key]
+
+    def smoothed(self, field, N, all_old = False, window = "trailing",
+                 gaps = "skip", trim = 0):
+        '''
+        Rolling mean of every trust's (combined) data, made in one call
+        for the whole dataset and then reused. See rolling.rolling_sum.
+
+        Parameters
+        ----------
+        field : int
+            Value matrix to smooth.
+        N : int
+            Number of points in each window.
+        all_old : bool
+            See merged.
+        window, gaps : string
+            See rolling.rolling_sum.
+        trim : int
+            Number of points at the end of each row to leave out, e.g.
+            the incomplete recent covid figures.
+
+        Returns
+        -------
+        smooth : array
+            Smoothed data, NaN where there is no complete window.
+        years : array
+            Mean date, in fractional years, of each window.
+        '''
+        key = (field, N, all_old, window, gaps, trim)
+        if key not in self.smoothed_data:
+            values = self.combined(field, all_old)
+            end = values.shape[-1] - trim
+            years = np.where(np.isnan(values), np.nan, self.axis.years)
+
+            smooth = np.full(values.shape, np.nan)
+            smooth_years = np.full(values.shape, np.nan)
+            smooth[:, :end] = rolling.rolling_mean(values[:, :end], N,
+                                                   window, gaps)
+            smooth_years[:, :end] = rolling.rolling_mean(years[:, :end], N,
+                                                         window, gaps)
+            self.smoothed_data[key] = (smooth, smooth_years)
+        return self.smoothed_data[key]
+
+class DataContext:
+    '''
+    Holds every dataset needed for a build so that each file is only read
+    once. Passed to the plotting and HTML functions in place of file paths.
+    All numbers are stored as float arrays with NaN for missing values.
+
+    Attributes
+    ----------
+    waiting : Dataset
+        A&E data with the format [names, dates, attendance, waiting]
+    beds : Dataset
+        Overnight bed data with the format [names, dates, beds]
+    covid : Dataset
+        Daily covid deaths with the format [names, dates, deaths]
+    registry : TrustRegistry
+        Canonical names, slugs and rows of every trust.
+    all_names : array
+        Every trust in any of the datasets, made on first use.
+    summary : TrustSummary
+        Per-trust summary of all the datasets, made on first use.
+    bed_stats : NationalBeds
+        National bed figures, made on first use.
+    '''
+
+    def __init__(self, waiting, beds, covid, registry):
+        self.waiting = waiting
+        self.beds = beds
+        self.covid = covid
+        self.registry = registry
+        self.universe = None
+        self.summary_table = None
+        self.national_beds = None
+
+    @property
+    def all_names(self):
+        if self.universe is None:
+            self.universe = proc.trust_universe(self.waiting[0], self.beds[0],
+                                                self.covid[0])
+        return self.universe
+
+    @property
+    def summary(self):
+        if self.summary_table is None:
+            self.summary_table = summarise(self, self.all_names)
+        return self.summary_table
+
+    @property
+    def bed_stats(self):
+        if self.national_beds is None:
+            self.national_beds = national_beds(self.beds, self.beds.mergers)
+        return self.national_beds
+
+    def prepare(self):
+        '''Makes the summary tables now rather than on first use, e.g.
+        before forking worker processes so that they share them rather
+        than each making their own'''
+        self.summary_table = self.summary
+        self.national_beds = self.bed_stats
+
+# value matrices held by each dataset, in the order of the .npy files
+waiting_fields = ("attendance", "waiting")
+bed_fields = ("beds",)
+covid_fields = ("deaths",)
+
+def typed_dates(dates):
+    '''Converts a date axis into a non-object array that can be saved
+    without pickling'''
+    dates = np.asarray(dates)
+    if dates.dtype == object:
+        if isinstance(dates[0], str):
+            dates = dates.astype(str)
+        else:
+            dates = dates.astype('datetime64[D]')
+    return dates
+
+def read_npy(data_file, fields):
+    '''
+    Reads one of the original pickled .npy files.
+
+    Returns
+    -------
+    dataset : tuple
+        [names, dates, *values] with each value matrix as a float array.
+    '''
+    names, dates, *values = np.load(data_file, allow_pickle=True)
+    values = [proc.to_float_matrix(value) for value in values]
+    return (np.asarray(names, dtype = object), dates, *values)
+
+def write_store(store_dir, names, dates, values, fields):
+    '''
+    Parameters
+    ----------
+    store_dir : string
+        Directory to save the dataset in. Created if needed.
+    names : list
+        Trust names.
+    dates : list
+        Date axis of the value matrices.
+    values : list
+        Float value matrices, one per field.
+    fields : tuple
+        Name of each value matrix.
+    '''
+    if not os.path.isdir(store_dir):
+        os.makedirs(store_dir)
+
+    np.save(os.path.join(store_dir, "names.npy"),
+            np.asarray(names, dtype = str), allow_pickle = False)
+    np.save(os.path.join(store_dir, "dates.npy"),
+            typed_dates(dates), allow_pickle = False)
+    for field, value in zip(fields, values):
+        np.save(os.path.join(store_dir, field + ".npy"),
+                np.asarray(value, dtype = np.float64), allow_pickle = False)
+
+def read_store(store_dir, fields, mmap_mode = 'r'):
+    '''
+    Reads a dataset saved with write_store. The value matrices are
+    memory-mapped read-only by default.
+
+    Returns
+    -------
+    dataset : tuple
+        [names, dates, *values]
+    '''
+    def path(field):
+        return os.path.join(store_dir, field + ".npy")
+
+    # load_datasets replaces the names with their canonical forms
+    names = np.load(path("names"), allow_pickle = False)
+    dates = np.load(path("dates"), allow_pickle = False)
+    if dates.dtype.kind == 'U':
+        dates = list(dates.astype(object))
+    values = [np.load(path(field), mmap_mode = mmap_mode,
+                      allow_pickle = False) for field in fields]
+    return (names, dates, *values)
+
+def read_dataset(path, fields):
+    '''Reads either a store directory or an original .npy file'''
+    if os.path.isdir(path):
+        return read_store(path, fields)
+    return read_npy(path, fields)
+
+def migrate_datasets(waiting_file, bed_file, covid_file, out_dir):
+    '''
+    One-off conversion of the original .npy files into stores that can
+    be passed to load_datasets.
+
+    Returns
+    -------
+    paths : tuple
+        The waiting, bed and covid store directories.
+    '''
+    paths = []
+    for data_file, fields, store in [(waiting_file, waiting_fields, "waiting"),
+                                     (bed_file, bed_fields, "beds"),
+                                     (covid_file, covid_fields, "covid")]:
+        names, dates, *values = read_npy(data_file, fields)
+        store_dir = os.path.join(out_dir, store)
+        write_store(store_dir, names, dates, values, fields)
+        paths.append(store_dir)
+
+    return tuple(paths)
+
+def load_datasets(waiting_data, bed_data, covid_data, cache_dir = None):
+    '''
+    Parameters
+    ----------
+    waiting_data : string
+        A&E waiting time .npy file or store directory.
+    bed_data : string
+        Overnight beds .npy file or store directory.
+    covid_data : string
+        Covid-19 deaths .npy file or store directory.
+    cache_dir : string
+        Directory to cache the trust registry in. Not cached if None.
+
+    Returns
+    -------
+    data : DataContext
+        All of the datasets, with the bed and covid names formatted to
+        match the A&E data.
+    '''
+    sources = {"waiting": read_dataset(waiting_data, waiting_fields),
+               "beds": read_dataset(bed_data, bed_fields),
+               "covid": read_dataset(covid_data, covid_fields)}
+
+    # bed and covid names are formatted to match waiting data
+    registry = load_registry({dataset: sources[dataset][0]
+                              for dataset in sources},
+                             capitalise = ("beds", "covid"),
+                             cache_dir = cache_dir)
+
+    # the covid data starts after the trusts merged, so has no old trusts
+    mergers = {"waiting": mergered_trusts, "beds": mergered_trusts,
+               "covid": {}}
+
+    datasets = []
+    for dataset, (names, dates, *values) in sources.items():
+        names = np.asarray(registry.canonical(dataset, names), dtype = object)
+        datasets.append(Dataset(names, dates, *values,
+                                rows = registry.rows[dataset],
+                                mergers = mergers[dataset]))
+
+    return DataContext(*datasets, registry)
@@ -0,0 +1,143 @@
+'''
+Content-addressed cache of rendered figures
+
+Each figure is stored under a key made from everything that goes into
+drawing it (see plot_data.chartKey), so a figure whose data, plotting
+code and style haven't changed is copied from the cache rather than
+drawn again. The cache is kept below a size limit by removing the least
+recently used figures.
+'''
+
+import os
+import shutil
+import hashlib
+import tempfile
+
+def make_key(*parts):
+    '''
+    Parameters
+    ----------
+    parts : list
+        Strings, bytes or numpy arrays describing the figure.
+
+    Returns
+    -------
+    key : string
+        sha1 of all of the parts.
+    '''
+    sha = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        elif not isinstance(part, bytes):
+            part = part.tobytes()
+        # length prefix so that the parts can't run into each other
+        sha.update(str(len(part)).encode() + b":" + part)
+    return sha.hexdigest()
+
+class FigureCache:
+    '''
+    Directory of figures named by their key.
+
+    Attributes
+    ----------
+    directory : string
+        Where the figures are kept. Created if needed.
+    max_bytes : int
+        Size the cache is cut back to by evict.
+    hits, misses : int
+        Number of figures found and not found in the cache.
+    '''
+
+    def __init__(self, directory, max_bytes = 500*2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, key, ext):
+        return os.path.join(self.directory, key + ext)
+
+    def touch(self, path):
+        '''Marks a cached figure as used, for evict'''
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def fetch(self, key, ext, out_file):
+        '''Copies the cached figure to out_file, returning False if there
+        isn't one'''
+        path = self.path(key, ext)
+        if not os.path.isfile(path):
+            return False
+        shutil.copyfile(path, out_file)
+        self.touch(path)
+        return True
+
+    def read(self, key, ext):
+        '''Contents of the cached figure, None if there isn't one'''
+        path = self.path(key, ext)
+        if not os.path.isfile(path):
+            return None
+        with open(path, "rb") as file:
+            contents = file.read()
+        self.touch(path)
+        return contents
+
+    def write(self, key, ext, contents):
+        '''Saves a figure in the cache. The file is written under a
+        temporary name first so that other processes never see part of
+        it.'''
+        handle, temp = tempfile.mkstemp(dir = self.directory, suffix = ".tmp")
+        with os.fdopen(handle, "wb") as file:
+            file.write(contents)
+        os.replace(temp, self.path(key, ext))
+
+    def store(self, key, ext, out_file):
+        '''Saves a copy of the figure file out_file in the cache'''
+        with open(out_file, "rb") as file:
+            self.write(key, ext, file.read())
+
+    def record(self, hits, misses):
+        self.hits += hits
+        self.misses += misses
+
+    def size(self):
+        '''Total size in bytes of the cached figures'''
+        return sum(entry.stat().st_size for entry in os.scandir(self.directory)
+                   if entry.is_file())
+
+    def evict(self):
+        '''
+        Removes the least recently used figures until the cache is no
+        larger than max_bytes.
+
+        Returns
+        -------
+        removed : int
+            Number of figures removed.
+        '''
+        entries = [entry for entry in os.scandir(self.directory)
+                   if entry.is_file()]
+        stats = {entry.path: entry.stat() for entry in entries}
+        total = sum(stat.st_size for stat in stats.values())
+
+        removed = 0
+        for path in sorted(stats, key = lambda path: stats[path].st_mtime):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= stats[path].st_size
+            removed += 1
+        return removed
+
+    def report(self):
+        '''Prints the number of hits and misses so far'''
+        total = self.hits + self.misses
+        rate = self.hits/total*100 if total else 0
+        print("Figure cache: {} hits, {} misses ({:.0f}% hit rate), "
+              "{:.1f} MB cached.".format(self.hits, self.misses, rate,
+                                         self.size()/2**20))
@@ -0,0 +1,69 @@
+'''
+Manifest of the files written by the build
+
+Records the key of each output file, a hash of everything it was made
+from (see plot_data.chartKey and build_website.pageKey), so that a later
+build can skip the files whose inputs haven't changed since they were
+written.
+'''
+
+import os
+import json
+import tempfile
+
+# bump when the way outputs are keyed changes to invalidate old manifests
+manifest_version = 1
+
+class BuildManifest:
+    '''
+    Keys of the output files of the last build, kept in a JSON file.
+
+    Attributes
+    ----------
+    path : string
+        The manifest file. Read if it exists, written by save.
+    keys : dict
+        Key of each output file, by path.
+    counts : dict
+        [written, skipped] of each kind of output so far.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.keys = {}
+        self.counts = {}
+        if os.path.isfile(path):
+            with open(path) as file:
+                saved = json.load(file)
+            if saved.get("version") == manifest_version:
+                self.keys = saved["keys"]
+
+    def fresh(self, out_file, key):
+        '''Whether out_file exists and was made from inputs with key'''
+        return self.keys.get(out_file) == key and os.path.isfile(out_file)
+
+    def update(self, out_file, key):
+        '''Notes that out_file has been made from inputs with key'''
+        self.keys[out_file] = key
+
+    def record(self, kind, written, skipped):
+        counts = self.counts.setdefault(kind, [0, 0])
+        counts[0] += written
+        counts[1] += skipped
+
+    def save(self):
+        '''Writes the manifest, under a temporary name first so that an
+        interrupted build leaves the old one in place'''
+        folder = os.path.dirname(self.path) or "."
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        handle, temp = tempfile.mkstemp(dir = folder, suffix = ".tmp")
+        with os.fdopen(handle, "w") as file:
+            json.dump({"version": manifest_version, "keys": self.keys}, file)
+        os.replace(temp, self.path)
+
+    def report(self):
+        '''Prints the number of files written and skipped so far'''
+        for kind, (written, skipped) in self.counts.items():
+            print("Build manifest: {} {} written, {} unchanged and "
+                  "skipped.".format(kind, written, skipped))
@@ -2,9 +2,17 @@
 Playing around with building functions for generating the news page
 '''
 
-from pandas_ods_reader import  read_ods
+import os
+import json
+import hashlib
 import numpy as np
 
+# local packages
+from build_website.ods import read_sheet
+
+# bump when the way the spreadsheet is read changes to invalidate old caches
+news_cache_version = 1
+
 def sanitize_names(names):
     '''
     Parameters
@@ -18,36 +26,95 @@ def sanitize_names(names):
         list of trust names with trailing spaces removed.
 
     '''
-    names = list(names)
     # Remove all trailing spaces
-    for i, name in enumerate(names):
-        while names[i][-1] == " ":
-            names[i] = names[i][:-1]
-    return np.asarray(names)
+    return np.char.rstrip(np.asarray(names, dtype = str), " ")
 
-def collectTrustNews(name, allNewsArray):
+def groupTrustNews(allNewsArray):
     '''
     Parameters
     ----------
-    name : string
-        Name of the trust.
     allNewsArray : array
         Raw array containing everything in the ods news file.
 
     Returns
     -------
-    newsItems : list
-        A list of each of the news items for the trust
+    grouped : dict
+        The news items of each trust named in the file, newest first.
     '''
+    grouped = {}
     names = sanitize_names(allNewsArray[:,0])
-    #print(names, ">>>>>>"+name+"\n\n\n\n\n")
-    releventItems = allNewsArray[names == name]
-    #print(releventItems)
-    newsItems = [newsItem for newsItem in releventItems]
+    for name, newsItem in zip(names, allNewsArray):
+        grouped.setdefault(name, []).append(newsItem)
+    
+    # sort news items in date order from newest first
+    for newsItems in grouped.values():
+        newsItems.sort(key = lambda newsItem: newsItem[3])
+        newsItems.reverse()
+    
+    return grouped
+
+def hash_file(fileName):
+    '''sha1 of the contents of a file, used as the news cache key'''
+    sha = hashlib.sha1()
+    with open(fileName, "rb") as file:
+        for block in iter(lambda: file.read(1 << 16), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def readNewsItems(newsFile):
+    '''
+    Reads every news item from the first sheet of the spreadsheet, skipping
+    the title and column headings.
+
+    Returns
+    -------
+    newsItems : list
+        The cells of each news item, None for empty cells.
+    '''
+    return read_sheet(newsFile, 1)[4:]
+
+def loadNewsItems(newsFile, cache_dir = None):
+    '''
+    Returns readNewsItems(newsFile), reading it from cache_dir if the
+    spreadsheet hasn't changed since it was saved and saving it there
+    otherwise. The file is only hashed if its size or modification time
+    has changed. No cache is used if cache_dir is None.
+    '''
+    if cache_dir is None:
+        return readNewsItems(newsFile)
+
+    cache_file = os.path.join(cache_dir, "news_items.json")
+    stat = os.stat(newsFile)
+    
+    cached = None
+    if os.path.isfile(cache_file):
+        with open(cache_file) as file:
+            cached = json.load(file)
+        if cached.get("version") != news_cache_version:
+            cached = None
+    
+    if cached is not None and cached["size"] == stat.st_size \
+            and cached["mtime"] == stat.st_mtime:
+        return cached["items"]
+    
+    key = hash_file(newsFile)
+    if cached is not None and cached["key"] == key:
+        newsItems = cached["items"]
+    else:
+        newsItems = readNewsItems(newsFile)
+    
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    with open(cache_file, "w") as file:
+        json.dump({"version": news_cache_version,
+                   "key": key,
+                   "size": stat.st_size,
+                   "mtime": stat.st_mtime,
+                   "items": newsItems}, file)
     
     return newsItems
 
-def makeNewsDictionary(allNames, newsFile):
+def makeNewsDictionary(allNames, newsFile, cache_dir = None):
     '''
     Parameters
     ----------
@@ -55,19 +122,26 @@ def makeNewsDictionary(allNames, newsFile):
         All names of trusts on the website.
     newsFile : string
         ods spreadsheet name containing the news items.
+    cache_dir : string
+        Directory to cache the news items in. Not cached if None.
 
     Returns
     -------
     news_dict : dict
-        Dictionary containing all the news items attributed to each trust.
+        Dictionary containing all the news items attributed to each trust,
+        newest first.
     '''
-    df = read_ods(newsFile, 1, headers=False)
-    everything = df.values[4:,:]
+    newsItems = loadNewsItems(newsFile, cache_dir)
+    width = max((len(newsItem) for newsItem in newsItems), default = 10)
+    everything = np.empty((len(newsItems), width), dtype = object)
+    everything[:] = newsItems
+    
+    grouped = groupTrustNews(everything)
     
     news_dict = {}
     
     for name in allNames:
-        news_dict[name] = collectTrustNews(name, everything)
+        news_dict[name] = grouped.get(name, [])
         
     return news_dict
     
@@ -102,38 +176,14 @@ def makeNewsItem(newsItem):
     
     return itemHTML
 
-def getDates(newsDict):
-    '''
-
-    Parameters
-    ----------
-    newsDict : dict
-        news item dictionary.
-
-    Returns
-    -------
-    dates : list
-        list of the dates of news items
-    '''
-
-    dates = [newsDict[i][3] for i in range(len(newsDict))]
-    
-    return dates
-
 def makeNewsBlock(name, newsDict):
     '''
     Returns news block HTML for trust name based of the contents of 
     newsDict.
     '''    
 
-    trust_news = np.asarray(newsDict[name])
-    
-    # get list of dates
-    dates = np.asarray(getDates(trust_news))
-    
-    # sort news items in date order from newest first
-    inds = dates.argsort()
-    trust_news = trust_news[inds][::-1]
+    # already sorted newest first
+    trust_news = newsDict[name]
     
     if len(trust_news)==0:
         blockHTML = noNewsHTML
@@ -175,8 +225,4 @@ if __name__ == "__main__":
     newsDict = makeNewsDictionary(allNames,newsFile)
     
     print(makeNewsBlock("England", newsDict))
-        
-    #engDict = newsDict["England"]
-    #dates = getDates(engDict)
-    #print(dates)
     
\ No newline at end of file
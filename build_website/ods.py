@@ -0,0 +1,152 @@
+'''
+Streaming reader for .ods spreadsheets
+
+Reads the content.xml of the spreadsheet with iterparse, one row at a
+time, so that memory use doesn't grow with the size of the rest of the
+document. Cells are read the same way as pandas_ods_reader.read_ods:
+text for string cells, floats for numbers, the ISO date for dates and
+None for empty cells.
+'''
+
+import zipfile
+import xml.etree.ElementTree as ET
+
+namespaces = {
+    "table": "urn:oasis:names:tc:opendocument:xmlns:table:1.0",
+    "office": "urn:oasis:names:tc:opendocument:xmlns:office:1.0",
+    "text": "urn:oasis:names:tc:opendocument:xmlns:text:1.0",
+    }
+
+def tag(prefix, name):
+    return "{{{}}}{}".format(namespaces[prefix], name)
+
+TABLE = tag("table", "table")
+ROW = tag("table", "table-row")
+CELL = tag("table", "table-cell")
+COVERED_CELL = tag("table", "covered-table-cell")
+PARAGRAPH = tag("text", "p")
+SPACE = tag("text", "s")
+TAB = tag("text", "tab")
+LINE_BREAK = tag("text", "line-break")
+
+ROWS_REPEATED = tag("table", "number-rows-repeated")
+COLUMNS_REPEATED = tag("table", "number-columns-repeated")
+VALUE_TYPE = tag("office", "value-type")
+VALUE = tag("office", "value")
+DATE_VALUE = tag("office", "date-value")
+TIME_VALUE = tag("office", "time-value")
+BOOLEAN_VALUE = tag("office", "boolean-value")
+SPACE_COUNT = tag("text", "c")
+
+def paragraph_text(element):
+    '''Text of a text:p element, including any links and spans'''
+    parts = [element.text or ""]
+    for child in element:
+        if child.tag == SPACE:
+            parts.append(" "*int(child.get(SPACE_COUNT, 1)))
+        elif child.tag == TAB:
+            parts.append("\t")
+        elif child.tag == LINE_BREAK:
+            parts.append("\n")
+        else:
+            parts.append(paragraph_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+def cell_value(cell):
+    '''Value of a table:table-cell element'''
+    value_type = cell.get(VALUE_TYPE)
+    if value_type is None:
+        return None
+    elif value_type in ("float", "percentage", "currency"):
+        return float(cell.get(VALUE))
+    elif value_type == "date":
+        return cell.get(DATE_VALUE)
+    elif value_type == "time":
+        return cell.get(TIME_VALUE)
+    elif value_type == "boolean":
+        return cell.get(BOOLEAN_VALUE) == "true"
+    return "\n".join(paragraph_text(p) for p in cell.iter(PARAGRAPH))
+
+def read_row(row):
+    '''
+    Values of a table:table-row element, without any trailing empty cells.
+    Repeated cells are only expanded up to the last cell with a value.
+    '''
+    values, empty = [], 0
+    for cell in row:
+        if cell.tag not in (CELL, COVERED_CELL):
+            continue
+        value = cell_value(cell)
+        repeat = int(cell.get(COLUMNS_REPEATED, 1))
+        if value is None:
+            empty += repeat
+        else:
+            values.extend([None]*empty + [value]*repeat)
+            empty = 0
+    return values
+
+def iter_rows(path, sheet = 1):
+    '''
+    Yields the values of each row of a sheet, leaving out the empty rows
+    at the end of the sheet.
+
+    Parameters
+    ----------
+    path : string
+        .ods file.
+    sheet : int
+        Sheet number, starting from 1 as in read_ods.
+    '''
+    tables, empty = 0, 0
+    # open elements, so that each row can be dropped once it has been read
+    parents = []
+    with zipfile.ZipFile(path) as ods, ods.open("content.xml") as content:
+        for event, element in ET.iterparse(content, events = ("start", "end")):
+            if event == "start":
+                parents.append(element)
+                if element.tag == TABLE:
+                    tables += 1
+                continue
+            parents.pop()
+
+            if element.tag == ROW:
+                if tables == sheet:
+                    values = read_row(element)
+                    repeat = int(element.get(ROWS_REPEATED, 1))
+                    if values:
+                        # empty rows are only kept if there is a row after them
+                        for _ in range(empty):
+                            yield []
+                        for _ in range(repeat):
+                            yield list(values)
+                        empty = 0
+                    else:
+                        empty += repeat
+                parents[-1].remove(element)
+            elif element.tag == TABLE and tables == sheet:
+                return
+
+def read_sheet(path, sheet = 1):
+    '''
+    Reads a sheet in the same layout as read_ods(path, sheet,
+    headers = False).values: every row padded with None to the same
+    width, with the empty columns and the empty rows at the end removed.
+
+    Returns
+    -------
+    rows : list
+        List of the values of each row.
+    '''
+    rows = list(iter_rows(path, sheet))
+    width = max((len(row) for row in rows), default = 0)
+
+    used = [False]*width
+    for row in rows:
+        for i, value in enumerate(row):
+            if value is not None:
+                used[i] = True
+    columns = [i for i in range(width) if used[i]]
+
+    return [[row[i] if i < len(row) else None for i in columns]
+            for row in rows]
@@ -6,22 +6,51 @@ Plotting website data
 import matplotlib.pyplot as plt
 import numpy as np
 import matplotlib
-from matplotlib.image import imread
+from matplotlib.image import imsave
 from matplotlib import patches
+from matplotlib.text import Text
 import matplotlib.dates as mdates
 import os
+import io
+import re
+from functools import lru_cache
 
 # third party packages
-from brokenaxes import brokenaxes
+from PIL import Image
 
 # local packages
 import build_website.process_data as proc
 from build_website.build_website import mergered_trusts, whichChunks
+from build_website.figure_cache import make_key
+from build_website.workers import workerPool
+import build_website.svg_charts as svg_charts
+from build_website.svg_charts import make_label
 
-# define plotting style
-matplotlib.rcParams['mathtext.fontset'] = 'stix'
-matplotlib.rcParams['font.family'] = 'sans-serif'
-matplotlib.rc('font', size=14)
+# define plotting style, the only matplotlib settings in the chart keys
+# (see styleKey)
+chart_style = {"mathtext.fontset": "stix",
+               "font.family": "sans-serif",
+               "font.size": 14,
+               # fixed ids so that an unchanged chart is saved with the
+               # same bytes by every run and every worker process
+               "svg.hashsalt": "howsmynhs"}
+matplotlib.rcParams.update(chart_style)
+# no date stamp, for the same reason
+svg_metadata = {"Date": None}
+
+# part of the key of every cached figure, see chartKey. Bump it when a
+# change outside the modules hashed by codeVersion alters the charts.
+chart_version = 1
+
+# compact SVG mode, see svgBytes: text is left as text, in the same font
+# where it's installed and a similar one where it isn't
+compact_style = {"svg.fonttype": "none",
+                 "font.sans-serif": ["DejaVu Sans", "Verdana", "Arial",
+                                     "Helvetica"]}
+compact_metadata = {"Date": None, "Creator": None, "Format": None,
+                    "Type": None}
+# decimal places of the coordinates in compact SVGs, in points
+svg_precision = 1
 
 # TODO: save data so I don't need these
 str2num = np.vectorize(float)
@@ -30,39 +59,6 @@ intvec = np.vectorize(int)
 # TODO: get plotting colours as arguments
 NHSblue = "#0072CE"
 
-def make_label(name):
-    ''' 
-    Reduces NHS trust name to key part
-        i.e Removes words like "NHS", "Trust", "Of", "Foundation" etc...
-
-    Parameters
-    ----------
-    name : string
-        NHS trust full name.
-
-    Returns
-    -------
-    label : string
-        Shortened NHS trust name.
-    '''
-    
-    remove = ["Trust", "Foundation", "NHS","University", "Hospital",
-              "Hospitals", "Of"]
-    
-    def check(word):
-        if word in remove:
-            return False
-        else:
-            return True
-    
-    words = np.asarray(name.split(" "))
-    
-    filtered_words = filter(check, words)
-    
-    label = ' '.join(filtered_words)
-    
-    return label
-    
 def fix_xticks(ax, xdata):
     '''
     Makes x-ticks into integers
@@ -115,20 +111,16 @@ def makeAnEgraph(name,
     '''
     
     # unpack data
-    names, dates, _, waiting = waiting_data
-    dates = proc.dates2num(dates)
-    
+    dates = waiting_data.axis.years
+    i = waiting_data.rows[name]
     
-    if name in mergered_trusts.keys():
+    # Combined data for merged trusts
+    waiting = waiting_data.combined(3, all_old = True)[i]
+    mask = ~np.isnan(waiting)
     
-        waiting, mask = proc.combineAnEData(waiting, 
-                                        names, 
-                                        name, 
-                                        mergered_trusts)
-       
-    else:
-        waiting = waiting[names == name][0]
-        mask = waiting != "-"
+    # 3 month average, made for every trust at once
+    smoothWaiting, smoothDates = waiting_data.smoothed(3, 3, all_old = True)
+    smoothMask = ~np.isnan(smoothWaiting[i])
     
     assert sum(mask) >= 10, "Error: Less than 10 data points for trust:{}".format(name)
     
@@ -136,10 +128,11 @@ def makeAnEgraph(name,
     ax = fig.add_subplot(111)
         
     # Plot in millions
-    if max(waiting[mask]) > 1e5:
+    maxWaiting = np.max(waiting[mask])
+    if maxWaiting > 1e5:
         ax.set_ylabel("People waiting over 4 hours\n(millions)")
         norm = 1e-6
-    elif max(waiting[mask]) > 1e3:
+    elif maxWaiting > 1e3:
         ax.set_ylabel("People waiting over 4 hours\n(thousands)")
         norm = 1e-3
     else:
@@ -149,7 +142,7 @@ def makeAnEgraph(name,
     # If numbers are all very small *and* they are being plotted, then
     # don't include the moving average
     plot_average = True
-    if max(waiting[mask]) < 10:
+    if maxWaiting < 10:
         plot_average = False
         
     # Add data points
@@ -159,8 +152,8 @@ def makeAnEgraph(name,
     # Add moving average
     #    - Only include label if data points aren't included
     if plot_average == True:
-        ax.plot(proc.movingAverage(dates[mask]), 
-                proc.movingAverage(waiting[mask]*norm), 
+        ax.plot(smoothDates[i][smoothMask], 
+                smoothWaiting[i][smoothMask]*norm, 
                 '-',
                 label="3 month average", 
                 lw=2,
@@ -177,51 +170,52 @@ def makeAnEgraph(name,
     
     return fig
   
-def plotWaitingData(data):
-    ''' Plot data NHS England A&E 4 hour waiting data'''
-    
-    print("Generating 4 hour waiting time graphs...", end = " ")
-    
-    # Load data
-    NHSdata = np.load(data, allow_pickle=True)
+def waitingCharts(data):
+    '''The ("waiting", name) of each trust with an A&E chart'''
+    NHSdata = data.waiting
     
-    names, dates, _, waiting = NHSdata
-    dates = proc.dates2num(dates)
-    #print(names)
-    ### Plot and save the data ###
+    names, _, _, waiting = NHSdata
     
     # List of old trusts which have since merged into something else
     oldTrusts = proc.get_old_trusts(mergered_trusts)
+    charts = []
     for i, name in enumerate(names[:]):
-        mask = waiting[i,:] != "-"
+        mask = ~np.isnan(waiting[i,:])
 
         #print(sum(mask))
-        check1 = type(name) == np.str_
+        check1 = isinstance(name, str)
         check2 = name not in oldTrusts
         check3 = sum(mask)>=10 or name in mergered_trusts.keys()
         
         if check1 and check2 and check3:
-            
-            figName = proc.makeFigureName(name, "waiting", "svg")
-            
-            fig = makeAnEgraph(name, NHSdata, legend = True)
-              
-            fig.savefig("figures/{}".format(figName))
-            plt.close(fig)             
+            charts.append(("waiting", name))
+    return charts
+
+def plotWaitingData(data, jobs = 1, cache = None, compact = False,
+                    backend = "matplotlib", manifest = None):
+    ''' Plot data NHS England A&E 4 hour waiting data. See renderCharts
+    for jobs, cache, compact, backend and manifest.'''
+    
+    print("Generating 4 hour waiting time graphs...", end = " ")
+    
+    renderCharts(data, waitingCharts(data), jobs, cache, compact, backend,
+                 manifest)
            
     print("Done.")
        
 def plotMergedBedData(newName, NHSdata):
     barColours = ["#004684", "#006BC8", "#39A1FC", "#71BCFE"]
      
-    allNames, dates, beds = NHSdata
+    allNames, _, beds = NHSdata
+    dates = NHSdata.axis.years
+    rows = NHSdata.rows
 
     fig = plt.figure(figsize=(6,4))
     ax = fig.add_subplot(111)
     
     # plot main data
-    mainData = beds[allNames == newName][0]
-    mainMask = mainData != "-"
+    mainData = beds[rows[newName]]
+    mainMask = ~np.isnan(mainData)
     if len(mainData[mainMask])>0:
         ax.bar(dates[mainMask], 
                 mainData[mainMask], 
@@ -234,8 +228,8 @@ def plotMergedBedData(newName, NHSdata):
     
     oldDataTotal = np.zeros(len(dates))
     for i, oldTrustName in enumerate(mergered_trusts[newName]):
-        oldData = beds[allNames == oldTrustName][0]
-        oldDataMask = oldData != "-"
+        oldData = beds[rows[oldTrustName]]
+        oldDataMask = ~np.isnan(oldData)
         
         ax.bar(dates[oldDataMask], oldData[oldDataMask], 
                 lw=3, width = 0.2,
@@ -244,10 +238,7 @@ def plotMergedBedData(newName, NHSdata):
                 label = make_label(oldTrustName))
   
         # determine bottom of the bars
-        if i == 0:
-            oldDataTotal = oldData
-        else:
-            oldDataTotal[oldDataMask] += oldData[oldDataMask]
+        oldDataTotal[oldDataMask] += oldData[oldDataMask]
             
     ax.set_ylabel("Total # of Available Beds")
     ax.set_ylim(0, (1.2 + \
@@ -255,9 +246,9 @@ def plotMergedBedData(newName, NHSdata):
                                               max(mainData[mainMask])))
     ax.legend(prop={"size":14},frameon=False, framealpha = 0, loc=2)
     
-    combined = proc.combineBedData(beds, allNames, newName, mergered_trusts)
+    combined, _ = NHSdata.merged(2)[newName]
     
-    ax = fix_xticks(ax, dates[combined!="-"])
+    ax = fix_xticks(ax, dates[~np.isnan(combined)])
     fig.tight_layout()
     
     return fig  
@@ -268,14 +259,14 @@ def plotBeds(name, NHSdata):
         fig = plotMergedBedData(name, NHSdata)
     
     else:
-        names, dates, all_beds = NHSdata
+        names, _, all_beds = NHSdata
+        dates = NHSdata.axis.years
         
-        beds = all_beds[names == name][0]
+        beds = all_beds[NHSdata.rows[name]]
         
-        dates = dates[beds != "-"]
-        beds = beds[beds != "-"]
-        # format name to match waiting data
-        names = proc.capitaliseFirst(names)
+        mask = ~np.isnan(beds)
+        dates = dates[mask]
+        beds = beds[mask]
         # rescale large numbers to be in thousands
         if max(beds) > 1000:
             rescale = 1/1000
@@ -286,6 +277,8 @@ def plotBeds(name, NHSdata):
         
         fig = plt.figure(figsize=(6,4))
         if min(beds) > 300 and (max(beds) - min(beds)) < min(beds)/3:
+            # only imported by the charts which need it
+            from brokenaxes import brokenaxes
             bax = brokenaxes(ylims=((0, 0.005*max(beds)*rescale), 
               (0.95*min(beds)*rescale, 1.02*max(beds)*rescale)), hspace=0.08)
             bax.set_ylabel(ylabel, labelpad = 50)
@@ -304,38 +297,52 @@ def plotBeds(name, NHSdata):
         
     return fig
 
-def plotBedData(data):
-    ''' Plot the number of beds at NHS England Trusts'''
-    
-    print("Generating graphs for the number of beds ...", end = " ")
-    
-    # Load data
-    NHSdata = np.load(data, allow_pickle=True)
+def bedCharts(data):
+    '''The ("beds", name) of each trust with a bed chart'''
+    NHSdata = data.beds
     
     names, dates, beds = NHSdata
-    # format name to match waiting data
-    names = proc.capitaliseFirst(names)
-    
-    #### Plot and save the data ####
     
     # List of old trusts which have since merged into something else
     oldTrusts = proc.get_all_dict_values(mergered_trusts)
+    charts = []
     for i, name in enumerate(names[:]):
-        if type(name) == str and not (name in oldTrusts):
+        if isinstance(name, str) and not (name in oldTrusts):
             
-            mask = (beds[i,:] != '-')     
+            mask = ~np.isnan(beds[i,:])
             
             if name in mergered_trusts.keys() or sum(mask)>=4:
-                
-                figName = proc.makeFigureName(name, "beds", "svg")
-                fig = plotBeds(name, NHSdata)
-                fig.savefig("figures/{}".format(figName), bbox_inches = 'tight')
-                plt.close()         
+                charts.append(("beds", name))
+    return charts
+
+def plotBedData(data, jobs = 1, cache = None, compact = False,
+                backend = "matplotlib", manifest = None):
+    ''' Plot the number of beds at NHS England Trusts. See renderCharts
+    for jobs, cache, compact, backend and manifest.'''
+    
+    print("Generating graphs for the number of beds ...", end = " ")
+    
+    renderCharts(data, bedCharts(data), jobs, cache, compact, backend,
+                 manifest)
+    plotBedsPieChart(data, compact, manifest)
+    
+    print("Done.")
+
+def plotBedsPieChart(data, compact = False, manifest = None):
+    ''' Plot the share of trusts with more, the same and fewer beds, for
+    the homepage. Skipped if the manifest has it with the same figures.'''
 
     #### Plot trust change pie chart #### 
-    more, same, fewer = proc.bed_change_per_trust(names,
-                                              beds,
-                                              mergered_trusts)
+    national = data.bed_stats
+    more, same, fewer = national.more, national.same, national.fewer
+    
+    figFile = "figures/BedsPieChart.svg"
+    if manifest is not None:
+        key = make_key("pie", codeVersion(), styleKey(),
+                       repr([more, same, fewer]), str(compact))
+        if manifest.fresh(figFile, key):
+            manifest.record("pie charts", 0, 1)
+            return
     
     plt.figure(figsize = (6,4))
     labels = 'Fewer Beds', 'Same*', 'More Beds'
@@ -352,58 +359,171 @@ def plotBedData(data):
     plt.tight_layout()
     plt.annotate("* change smaller than 50 beds.", 
                   (0.2, -1.2), size = 13, color = "gray")
-    plt.savefig("figures/BedsPieChart.svg")      
+    with open(figFile, "wb") as file:
+        file.write(svgBytes(plt.gcf(), compact = compact))
     plt.close( )      
-                
-    print("Done.")
+    
+    if manifest is not None:
+        manifest.update(figFile, key)
+        manifest.record("pie charts", 1, 0)
 
-def makeOGtempImgs(name, waiting_data, bed_data, covid_data,
-                   AnEblock, bedblock, covidblock):
-    '''Makes and saves the temp files for making the OG image for trust
-    'name'.'''
-    def getAnEPart(name, waiting_data):
-        '''
-        Makes and saves the A&E part of the OG image
-        '''
-        fig = makeAnEgraph(name, 
-                            waiting_data, 
-                            legend = False)
-        fig.set_size_inches(6, 4)
-
-        fig.savefig("og_temp_AnE.png", dpi = 100, bbox_inches = 'tight')
-        plt.close(fig)
-        
-    def getBedPart(name, bed_data):
-        '''
-        Makes and saves the bed part of the OG image
-        '''    
-        
-        fig = plotBeds(name, bed_data)
-        fig.set_size_inches(6, 4)
-        fig.savefig("og_temp_bed.png", dpi = 100, bbox_inches = 'tight')
-        plt.close(fig)
-        
-    def getCovidPart(name, covid_data):
-        fig = makeCovidGraph(name, covid_data, legend = False)
-        fig.set_size_inches(6, 4)
-        fig.savefig("og_temp_covid.png", dpi = 100, bbox_inches = 'tight')
-        plt.close(fig)
-        
+# OG versions of the charts made while saving the SVGs, as png bytes keyed
+# by (kind, name), so that each chart is only built once per build
+og_parts = {}
+
+def makeChart(kind, name, data):
+    '''Makes the "waiting", "beds" or "covid" chart of trust name, as
+    shown on the trust page'''
+    if kind == "waiting":
+        return makeAnEgraph(name, data.waiting, legend = True)
+    elif kind == "beds":
+        return plotBeds(name, data.beds)
+    elif kind == "covid":
+        return makeCovidGraph(name, data.covid)
+    raise ValueError("Unknown chart: {}".format(kind))
+
+def ogStyle(fig, scale = 18/14):
+    '''
+    Restyles a chart made for the trust page for the OG image: no legend
+    and larger text, as the charts are shrunk in the OG image.
+    '''
+    for ax in fig.axes:
+        legend = ax.get_legend()
+        if legend is not None:
+            legend.remove()
+    
+    for text in fig.findobj(Text):
+        text.set_fontsize(text.get_fontsize()*scale)
+    
+    # ticks made when the figure is next drawn need the new size too
+    for ax in fig.axes:
+        for axis, name in [(ax.xaxis, "x"), (ax.yaxis, "y")]:
+            labels = axis.get_ticklabels()
+            if labels:
+                ax.tick_params(axis = name, labelsize = labels[0].get_fontsize())
+    
+    if len(fig.axes) == 1:
+        fig.tight_layout()
+    return fig
+
+def rasterise(fig):
+    '''
+    Renders fig exactly as fig.savefig("name.png", dpi = 100,
+    bbox_inches = 'tight') would, but into memory rather than a file.
+
+    Returns
+    -------
+    png : bytes
+        The png file.
+    '''
+    buffer = io.BytesIO()
+    # the png is only decoded again, so only compress it a little
+    fig.savefig(buffer, format = "png", dpi = 100, bbox_inches = 'tight',
+                pil_kwargs = {"compress_level": 1})
+    return buffer.getvalue()
+
+def ogPart(fig):
+    '''Restyles a trust page chart for the OG image and renders it'''
+    fig.set_size_inches(6, 4)
+    return rasterise(ogStyle(fig))
+
+def needsOGpart(kind, name, data):
+    '''Whether the OG image of trust name includes its kind chart'''
+    AnEblock, bedblock, covidblock = whichChunks(name, data)
+    blocks = {"waiting": AnEblock, "beds": bedblock, "covid": covidblock}
+    return (AnEblock or bedblock) and blocks[kind]
+
+@lru_cache(maxsize = None)
+def codeVersion():
+    '''sha1 of the code which draws the charts and prepares their data'''
+    parts = [str(chart_version), matplotlib.__version__]
+    folder = os.path.dirname(__file__)
+    for module in [__file__, os.path.join(folder, "svg_charts.py"),
+                   os.path.join(folder, "rolling.py"),
+                   os.path.join(folder, "datasets.py"),
+                   os.path.join(folder, "process_data.py"),
+                   os.path.join(folder, "summary.py")]:
+        with open(module, "rb") as file:
+            parts.append(file.read())
+    return make_key(*parts)
+
+def styleKey():
+    '''The matplotlib settings of chart_style as a string. The rest are
+    matplotlib's defaults, which are covered by its version.'''
+    return repr(sorted((key, matplotlib.rcParams[key])
+                       for key in chart_style))
+
+def chartInputs(kind, name, data):
+    '''The data drawn in the kind chart of trust name, after merging'''
+    if kind == "waiting":
+        dataset = data.waiting
+        return [dataset.axis.years,
+                dataset.combined(3, all_old = True)[dataset.rows[name]]]
+    elif kind == "beds":
+        dataset = data.beds
+        trusts = [name] + list(mergered_trusts.get(name, []))
+        return [dataset.axis.years] + [dataset[2][dataset.rows[trust]]
+                                       for trust in trusts]
+    elif kind == "covid":
+        dataset = data.covid
+        return [dataset.axis.times, dataset[2][dataset.rows[name]]]
+    raise ValueError("Unknown chart: {}".format(kind))
+
+def chartKey(kind, name, data):
+    '''
+    Key of a chart in the figure cache: its data, the plotting code and
+    the matplotlib style. The key of an OG image is made from the keys of
+    the charts it is composed of.
+    '''
+    if kind == "og":
+        blocks = zip(["waiting", "beds", "covid"], whichChunks(name, data))
+        parts = [chartKey(part, name, data) for part, block in blocks
+                 if block]
+    else:
+        parts = chartInputs(kind, name, data)
+    return make_key(kind, name, codeVersion(), styleKey(), *parts)
+
+def makeOGparts(name, data, AnEblock, bedblock, covidblock, cache = None):
+    '''Makes the images of each of the graphs in the OG image for trust
+    'name', reusing the charts rendered while saving the SVGs or kept in
+    the figure cache.'''
     assert AnEblock or bedblock or covidblock, "Error: No plots available"
 
-    # Make and save the figures as png files
-    if AnEblock:
-        getAnEPart(name, waiting_data)
-    if bedblock:
-        getBedPart(name, bed_data)
-    if covidblock:
-        getCovidPart(name, covid_data)
+    # the figures, in the order they are shown
+    kinds = [kind for kind, block in [("waiting", AnEblock),
+                                      ("beds", bedblock),
+                                      ("covid", covidblock)] if block]
+    images = []
+    for kind in kinds:
+        png = og_parts.get((kind, name))
+        if png is None and cache is not None:
+            key = chartKey(kind, name, data)
+            png = cache.read(key, ".og.png")
+        if png is None:
+            fig = makeChart(kind, name, data)
+            png = ogPart(fig)
+            plt.close(fig)
+            if cache is not None:
+                cache.write(key, ".og.png", png)
+        images.append(decodePNG(png))
+    return images
         
+# size of the OG image in pixels
+og_shape = (630, 1200)
+
+# solid pale blue (0, 0.4, 1) at 10% opacity, over white
+og_background = np.array([230, 240, 255, 255], dtype = np.uint8)
+
+def decodePNG(png):
+    '''RGBA uint8 array of a png file'''
+    return np.asarray(Image.open(io.BytesIO(png)).convert("RGBA"))
+
 def addBorder(img, border_size = 4):
+    '''Copy of the uint8 RGBA image inside a solid black border'''
     newImg = np.zeros((img.shape[0] + border_size*2,
-                     img.shape[1] + border_size*2,
-                     4))
-    newImg[:,:,3] = 1
+                       img.shape[1] + border_size*2,
+                       4), dtype = np.uint8)
+    newImg[:,:,3] = 255
     newImg[border_size:-border_size,border_size:-border_size,:] = img
     
     return newImg
@@ -422,75 +542,69 @@ def addLogo(fig):
     ax.annotate("?",(1059, 540), size = 28, color = "#231f20")
     return fig
 
-def deleteTempOGFiles():
-    try:
-        os.remove("og_temp_bed.png")
-    except:
-        pass
-    try:
-        os.remove("og_temp_AnE.png")
-    except:
-        pass
-    try:
-        os.remove("og_temp_covid.png")
-    except:
-        pass
-    return None
-
-def makeOGimage(name, waiting_data, bed_data, covid_data):
-    
-    matplotlib.rc('font', size=18)
-    # load data
-    ane_names, dates, attendance, waiting = waiting_data
-    bed_names, dates, beds = bed_data
-    bed_names = proc.capitaliseFirst(bed_names)
-    covid_names, dates, deaths = covid_data
-    covid_names = proc.capitaliseFirst(covid_names)
-    
-    AnEblock, bedblock, covidblock = whichChunks(name, ane_names, bed_names, 
-                                    covid_names, waiting, beds, covid_data)
+@lru_cache(maxsize = None)
+def logoSprite():
+    '''
+    The logo drawn by addLogo, rendered once onto a transparent OG sized
+    image and cropped to the logo.
+
+    Returns
+    -------
+    sprite : array
+        uint8 RGBA image of the logo.
+    position : tuple
+        (y, x) of the top left of the sprite in the OG image.
+    '''
+    height, width = og_shape
+    fig = plt.figure(figsize = (width/100, height/100), dpi = 100)
+    ax = fig.add_axes((0, 0, 1, 1))
+    # pixel coordinates, as for imshow of the canvas
+    ax.set_xlim(-0.5, width - 0.5)
+    ax.set_ylim(height - 0.5, -0.5)
+    ax.set_axis_off()
+    addLogo(fig)
+    
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format = "png", dpi = 100, transparent = True)
+    plt.close(fig)
+    img = decodePNG(buffer.getvalue())
+    
+    ys, xs = np.nonzero(img[:,:,3])
+    sprite = img[ys.min():ys.max() + 1, xs.min():xs.max() + 1].copy()
+    sprite.flags.writeable = False
+    return sprite, (ys.min(), xs.min())
+
+def blend(canvas, sprite, y, x):
+    '''Draws the uint8 RGBA sprite over the opaque canvas at (y, x)'''
+    region = canvas[y:y + sprite.shape[0], x:x + sprite.shape[1], :3]
+    alpha = sprite[:,:,3:].astype(np.uint16)
+    region[...] = (sprite[:,:,:3]*alpha + region*(255 - alpha) + 127)//255
+
+def makeOGimage(name, data, cache = None):
+    '''
+    Composes the OG image of trust name from its charts, see makeOGparts
+    for cache.
+
+    Returns
+    -------
+    canvas : array
+        uint8 RGBA image, None if the trust has no OG image.
+    '''
+    AnEblock, bedblock, covidblock = whichChunks(name, data)
     #print(AnEblock, bedblock)
     if not (AnEblock or bedblock):
         return None
     
-    # Make temp files
-    makeOGtempImgs(name, waiting_data, bed_data, covid_data, AnEblock, bedblock, covidblock)
-        
-    canvas = np.zeros((630, 1200, 4))
+    # Make the graphs
+    images = makeOGparts(name, data, AnEblock, bedblock, covidblock, cache)
+    images = [addBorder(img) for img in images]
     
-    # solid pale blue canvas
-    canvas[:,:,1] = 0.4
-    canvas[:,:,2] = 1
-    canvas[:,:,3] = 0.1
-    fig = plt.figure(figsize = (12, 6.3), dpi=100)
-    ax1 = fig.add_axes((0, 0, 1, 1))    
+    canvas = np.empty(og_shape + (4,), dtype = np.uint8)
+    canvas[:] = og_background
 
-    images = []
-    # Make and save the figures as png files
-    if AnEblock:
-        img = imread('og_temp_AnE.png')
-        img = addBorder(img)
-        images.append(img)
-        
-    if bedblock:
-        img = imread('og_temp_bed.png')
-        img = addBorder(img)
-        images.append(img)
-        
-    if covidblock:
-        img = imread('og_temp_covid.png')
-        img = addBorder(img)
-        images.append(img)
-        
     if len(images) == 1:
         # Only one plot
-        img1 = images[0]
-        
-        y1 = 140; x1 = 260
-        
-        canvas[y1:img1.shape[0]+y1, x1:img1.shape[1]+x1, :] = img1
-        
-        ax1.imshow(canvas)
+        ys, xs = [140], [260]
         
     elif len(images) > 1:
         # Two plots
@@ -502,66 +616,58 @@ def makeOGimage(name, waiting_data, bed_data, covid_data):
         ys = np.linspace(yup, ydown,num_images,dtype='int')
         xup = 310; xdown = 70
         xs = np.linspace(xup, xdown,num_images,dtype='int')
-        #print(xs)
-        for i in range(num_images):
-            canvas[ys[i]:images[i].shape[0] +ys[i], xs[i]:images[i].shape[1] + xs[i],:] = images[i]
-        
-        ax1.imshow(canvas)
-        
         
     else:
         return None 
-       
-    ax1.set_xticks([])
-    ax1.set_yticks([])
-    ax1.set_axis_off()
-    fig = addLogo(fig)
-    # delete temp files
-    deleteTempOGFiles()
-    return fig
+    
+    for img, y, x in zip(images, ys, xs):
+        canvas[y:img.shape[0] + y, x:img.shape[1] + x, :] = img
+    
+    sprite, (y, x) = logoSprite()
+    blend(canvas, sprite, y, x)
+    return canvas
     
 def makeOGfile():
     if not os.path.isdir("figures/og"):
         os.mkdir("figures/og")
 
-def plotOGimages(waiting_file, bed_file, covid_file):
+def plotOGimages(data, jobs = 1, cache = None, manifest = None):
+    ''' Make the OG image of every trust. See renderCharts for jobs,
+    cache and manifest.'''
     print("Generating OG images ...", end = " ")
     
     makeOGfile()
     
-    # Load data
-    waiting_data = np.load(waiting_file, allow_pickle=True)
-    bed_data = np.load(bed_file, allow_pickle=True)
-    covid_data = np.load(covid_file, allow_pickle=True)
-    
-    # Combine names
-    bed_names = proc.capitaliseFirst(bed_data[0])
-    covid_names = proc.capitaliseFirst(covid_data[0])
-    allNames = proc.combineNames(waiting_data[0], bed_names)
-    allNames = proc.combineNames(allNames, covid_names)
-    
-    for name in allNames:
-        figName = proc.makeFigureName(name, "og", "png")
-        fig = makeOGimage(name, waiting_data, bed_data, covid_data)
-        if fig != None:
-            fig.savefig("figures/og/{}".format(figName), 
-                        bbox_inches = 'tight', pad_inches=0)
-            plt.close(fig)
+    # the trusts with an OG image, see makeOGimage
+    charts = [("og", name) for name in data.all_names
+              if any(whichChunks(name, data)[:2])]
+    renderCharts(data, charts, jobs, cache, manifest = manifest)
+    
+    # the rendered charts aren't needed any more
+    og_parts.clear()
+    
     print("Done.")
             
 def makeCovidGraph(name, data, legend = True):
     fig  = plt.figure(figsize=(6,4))
     ax = fig.add_subplot(111)
       
-    names, dates, deaths = data
-    trustDeaths = deaths[names == name].T
+    names, _, deaths = data
+    dates = data.axis.times
+    i = data.rows[name]
+    trustDeaths = deaths[i]
+    
+    # weekly average, made for every trust at once
+    smoothDeaths, _ = data.smoothed(2, 7, window = "centred",
+                                    gaps = "propagate", trim = 3)
+    smoothMask = ~np.isnan(smoothDeaths[i])
 
     # Add data points
     ax.plot_date(dates, trustDeaths, 'b.', alpha = 0.2, ms = 10)
     
     # moving average (Missing out most recent 3 points due to incompleteness)
-    ax.plot_date(dates[3:-6],
-                proc.movingAverage(trustDeaths[:-3], N=7),
+    ax.plot_date(dates[smoothMask],
+                smoothDeaths[i][smoothMask],
                  '-', label="Weekly Average", lw=2,
                  color = "#e60000")
     
@@ -579,25 +685,385 @@ def makeCovidGraph(name, data, legend = True):
     
     return fig
             
-def plotCovidData(datafile):
-    ''' Plot daily covid deaths'''
+def covidCharts(data):
+    '''The ("covid", name) of each trust with covid data'''
+    return [("covid", name) for name in data.covid[0]]
+
+def plotCovidData(data, jobs = 1, cache = None, compact = False,
+                  backend = "matplotlib", manifest = None):
+    ''' Plot daily covid deaths. See renderCharts for jobs, cache,
+    compact, backend and manifest.'''
     
     print("Generating Covid-19 graphs...", end = " ")
     
-    # Load data
+    renderCharts(data, covidCharts(data), jobs, cache, compact, backend,
+                 manifest)
+           
+    print("Done.")
+
+def segmentDistance(point, start, end):
+    '''Distance in points from point to the line segment start-end'''
+    p, a, b = np.asarray(point), np.asarray(start), np.asarray(end)
+    length = np.dot(b - a, b - a)
+    if length == 0:
+        return np.hypot(*(p - a))
+    t = min(max(np.dot(p - a, b - a)/length, 0), 1)
+    return np.hypot(*(p - a - t*(b - a)))
+
+def simplifyLines(commands, tolerance):
+    '''
+    Drops the L (line to) commands of an SVG path whose points all lie
+    within tolerance of the straight line which replaces them, e.g. the
+    middle points of a straight or gently curving run of a line chart.
+    Curves, moves and the ends of each run of lines are kept.
+
+    Parameters
+    ----------
+    commands : list
+        Path commands with absolute coordinates, e.g. "L 12.5 40".
+    tolerance : float
+        Furthest, in points, a dropped point may be from the new line.
+
+    Returns
+    -------
+    commands : list
+    '''
+    def point(command):
+        return [float(value) for value in command[1:].split()]
+
+    kept, anchor, dropped = [], None, []
+    for i, command in enumerate(commands):
+        if command.startswith("L") and kept and command == kept[-1]:
+            continue
+        following = commands[i + 1] if i + 1 < len(commands) else ""
+        if command.startswith("L") and anchor is not None \
+                and following.startswith("L"):
+            end = point(following)
+            candidates = dropped + [point(command)]
+            if all(segmentDistance(p, anchor, end) <= tolerance
+                   for p in candidates):
+                dropped = candidates
+                continue
+        kept.append(command)
+        anchor = point(command) if command[:1] in ("M", "L") else None
+        dropped = []
+    return kept
+
+def compactSVG(svg, precision = svg_precision):
+    '''
+    Shrinks an SVG written by matplotlib: rounds the coordinates to
+    precision decimal places, simplifies the lines of each path (see
+    simplifyLines) to within half a rounding step, which drops repeated
+    and collinear points, and removes the indentation.
+    '''
+    tolerance = 0.5*10**-precision
     
-    data = np.load(datafile, allow_pickle=True)
-    names = data[0] 
-    names = proc.capitaliseFirst(names)
+    def roundNumber(match):
+        number = "{:.{}f}".format(float(match.group()), precision)
+        if "." in number:
+            number = number.rstrip("0").rstrip(".")
+        return "0" if number == "-0" else number
     
-    ### Plot and save the data ###
-    for i, name in enumerate(names[:]):
-        figName = proc.makeFigureName(name, "covid", "svg")
+    def roundPath(match):
+        commands = re.findall(r"[A-Za-z][^A-Za-z]*",
+                              re.sub(r"-?\d+\.\d+", roundNumber, match.group(2)))
+        path = simplifyLines([" ".join(command.split())
+                              for command in commands], tolerance)
+        return '{}"{}"'.format(match.group(1), " ".join(path))
+    
+    def roundAttribute(match):
+        return '{}"{}"'.format(match.group(1),
+                               re.sub(r"-?\d+\.\d+", roundNumber, match.group(2)))
+    
+    svg = re.sub(r'(\sd=)"([^"]*)"', roundPath, svg)
+    svg = re.sub(r'(\s(?:x|y|width|height|transform)=)"([^"]*)"',
+                 roundAttribute, svg)
+    return re.sub(r"\n\s+<", "\n<", svg)
+
+def svgBytes(fig, kind = None, compact = False):
+    '''
+    Renders fig as the SVG saved for the trust pages.
 
-        fig = makeCovidGraph(name, data)
+    Parameters
+    ----------
+    fig : matplotlib figure
+        
+    kind : string
+        Chart kind, the "beds" charts are cropped to their contents.
+    compact : bool
+        Write a compact SVG: text as text rather than paths, see
+        compact_style, no metadata and rounded coordinates, see
+        compactSVG.
 
-        fig.savefig("figures/{}".format(figName))
-        plt.close(fig)             
-           
-    print("Done.")
-    
\ No newline at end of file
+    Returns
+    -------
+    svg : bytes
+        The SVG file.
+    '''
+    buffer = io.BytesIO()
+    options = {"bbox_inches": 'tight'} if kind == "beds" else {}
+    if not compact:
+        fig.savefig(buffer, format = "svg", metadata = svg_metadata, **options)
+        return buffer.getvalue()
+    
+    with matplotlib.rc_context(compact_style):
+        fig.savefig(buffer, format = "svg", metadata = compact_metadata,
+                    **options)
+    return compactSVG(buffer.getvalue().decode()).encode()
+
+def svgSizeReport(data, sample = 20):
+    '''
+    Prints the size of the standard and compact SVGs of each kind of
+    chart, drawn in memory for the first sample trusts of each kind (or
+    all of them with sample = None).
+
+    Returns
+    -------
+    sizes : dict
+        (standard bytes, compact bytes, number of charts) of each kind.
+    '''
+    sizes = {}
+    for charts in [waitingCharts(data), bedCharts(data), covidCharts(data)]:
+        standard = compact = count = 0
+        for kind, name in charts[:sample]:
+            try:
+                fig = makeChart(kind, name, data)
+            except Exception:
+                plt.close('all')
+                continue
+            standard += len(svgBytes(fig, kind))
+            compact += len(svgBytes(fig, kind, compact = True))
+            count += 1
+            plt.close(fig)
+        if count:
+            sizes[kind] = (standard, compact, count)
+    
+    print("{:<10}{:>8}{:>14}{:>14}{:>9}".format("Chart", "Number",
+                                               "Standard kB", "Compact kB",
+                                               "Saving"))
+    for kind, (standard, compact, count) in sizes.items():
+        print("{:<10}{:>8}{:>14.1f}{:>14.1f}{:>8.0f}%".format(
+            kind, count, standard/1024, compact/1024,
+            100*(1 - compact/standard)))
+    return sizes
+
+def chartFile(kind, slug, compact = False, backend = "matplotlib"):
+    '''The file a chart of the trust with slug is saved to, and the
+    extension of the version of it written with compact and backend in the
+    figure cache'''
+    if kind == "og":
+        return "figures/og/{}".format(proc.makeFigureName(slug, "og", "png")), \
+            ".png"
+    figFile = "figures/{}".format(proc.makeFigureName(slug, kind, "svg"))
+    if backend == "native":
+        return figFile, ".native.svg"
+    return figFile, ".compact.svg" if compact else ".svg"
+
+def saveChart(kind, name, data, cache = None, compact = False,
+              backend = "matplotlib"):
+    '''
+    Makes and saves the "waiting", "beds" or "covid" chart or the "og"
+    image of trust name. With a FigureCache, a chart already in the cache
+    is copied from it rather than made again, and a new chart is added
+    to it. compact selects the compact SVG, see svgBytes, and backend
+    the chart writer, see renderCharts.
+
+    Returns
+    -------
+    png : bytes
+        The chart rendered for the OG image, None if it isn't needed or
+        the chart came from the cache.
+    hit : bool
+        Whether the chart came from the cache.
+    '''
+    figFile, ext = chartFile(kind, data.registry.slugs[name], compact,
+                             backend)
+    
+    key = None
+    if cache is not None:
+        key = chartKey(kind, name, data)
+        if cache.fetch(key, ext, figFile):
+            return None, True
+    
+    if kind == "og":
+        canvas = makeOGimage(name, data, cache)
+        if canvas is not None:
+            imsave(figFile, canvas)
+            if key is not None:
+                cache.store(key, ext, figFile)
+        return None, False
+    
+    if backend == "native":
+        # the OG image draws its own version of the chart with matplotlib
+        with open(figFile, "w") as file:
+            file.write(svg_charts.makeChart(kind, name, data))
+        if key is not None:
+            cache.store(key, ext, figFile)
+        return None, False
+    elif backend != "matplotlib":
+        raise ValueError("Unknown chart backend: {}".format(backend))
+    
+    fig = makeChart(kind, name, data)
+    with open(figFile, "wb") as file:
+        file.write(svgBytes(fig, kind, compact))
+    if key is not None:
+        cache.store(key, ext, figFile)
+    
+    # render the OG version from the same figure
+    png = None
+    if needsOGpart(kind, name, data):
+        png = ogPart(fig)
+        if key is not None:
+            cache.write(key, ".og.png", png)
+    
+    plt.close(fig)
+    return png, False
+
+def tryChart(kind, name, data, cache = None, compact = False,
+             backend = "matplotlib"):
+    '''Runs saveChart, returning (error, png, hit) where error is None or
+    a description of what went wrong'''
+    try:
+        png, hit = saveChart(kind, name, data, cache, compact, backend)
+    except Exception as error:
+        plt.close('all')
+        return "{}: {}".format(type(error).__name__, error), None, False
+    return None, png, hit
+
+# dataset, figure cache, SVG mode and chart writer used by each worker
+# process, see renderCharts
+worker_data = None
+worker_cache = None
+worker_compact = False
+worker_backend = "matplotlib"
+
+def initWorker(data, parts, cache, compact, backend):
+    global worker_data, worker_cache, worker_compact, worker_backend
+    global og_parts
+    worker_data = data
+    worker_cache = cache
+    worker_compact = compact
+    worker_backend = backend
+    og_parts = parts
+    plt.switch_backend("Agg")
+
+def renderChart(chart):
+    kind, name = chart
+    return tryChart(kind, name, worker_data, worker_cache, worker_compact,
+                    worker_backend)
+
+def outputLabel(kind):
+    '''How charts of kind are described by BuildManifest.report'''
+    return "OG images" if kind == "og" else kind + " charts"
+
+def staleCharts(data, charts, compact, backend, manifest):
+    '''
+    The charts which need making again, see renderCharts. The rest are
+    counted as skipped in the manifest.
+
+    Returns
+    -------
+    stale : list
+        (kind, name) of each chart whose file is missing or whose key has
+        changed since the manifest was saved.
+    outputs : dict
+        (file, key) of each stale chart, to update the manifest with once
+        it has been made. None if the key couldn't be made.
+    '''
+    # a few names share a file, only the last of their charts is kept as
+    # it would overwrite the others
+    files = {chartFile(kind, data.registry.slugs[name], compact, backend):
+             (kind, name)
+             for kind, name in charts}
+    stale, outputs = [], {}
+    for (figFile, ext), (kind, name) in files.items():
+        try:
+            key = make_key(chartKey(kind, name, data), ext)
+        except Exception:
+            # the chart can't be made either, saveChart reports why
+            key = None
+        if key is not None and manifest.fresh(figFile, key):
+            manifest.record(outputLabel(kind), 0, 1)
+            continue
+        stale.append((kind, name))
+        outputs[(kind, name)] = (figFile, key) if key is not None else None
+    return stale, outputs
+
+def renderCharts(data, charts, jobs = 1, cache = None, compact = False,
+                 backend = "matplotlib", manifest = None):
+    '''
+    Makes and saves each chart, either one after another or spread over a
+    pool of worker processes. A chart that fails doesn't stop the rest,
+    the failures are printed at the end instead. The OG versions of the
+    charts are kept in og_parts for plotOGimages.
+
+    Parameters
+    ----------
+    data : DataContext
+        All of the datasets. Shared with the workers without copying
+        where the platform can fork, see workers.workerPool.
+    charts : list
+        (kind, name) of each chart, see saveChart.
+    jobs : int
+        Number of worker processes, None for one per CPU. With 1 the
+        charts are made in this process.
+    cache : FigureCache
+        Where to look for charts made by earlier builds, None to make
+        every chart. The cache's hits and misses are updated and its
+        least recently used figures evicted afterwards.
+    compact : bool
+        Save compact SVGs, see svgBytes.
+    backend : string
+        "matplotlib" to draw the charts with matplotlib, or "native" to
+        write them directly with svg_charts, which is much faster. The OG
+        images are drawn with matplotlib either way.
+    manifest : BuildManifest
+        Keys of the charts saved by earlier builds. A chart whose file is
+        still there and whose key hasn't changed is skipped. None to make
+        every chart.
+
+    Returns
+    -------
+    failures : list
+        (kind, name, error) of each chart which couldn't be made.
+    '''
+    if jobs is None:
+        jobs = os.cpu_count()
+    
+    if manifest is not None:
+        charts, outputs = staleCharts(data, charts, compact, backend, manifest)
+    
+    if jobs <= 1 or len(charts) <= 1:
+        results = [tryChart(kind, name, data, cache, compact, backend)
+                   for kind, name in charts]
+    else:
+        with workerPool(jobs, initWorker, (data, og_parts, cache, compact,
+                                           backend)) as pool:
+            results = pool.map(renderChart, charts,
+                               chunksize = max(1, len(charts)//(4*jobs)))
+    
+    failures = []
+    hits = 0
+    for (kind, name), (error, png, hit) in zip(charts, results):
+        if error is not None:
+            failures.append((kind, name, error))
+            continue
+        if png is not None:
+            og_parts[(kind, name)] = png
+        hits += hit
+        output = outputs.get((kind, name)) if manifest is not None else None
+        # the trusts without an OG image have no file to record
+        if output is not None and os.path.isfile(output[0]):
+            manifest.update(*output)
+            manifest.record(outputLabel(kind), 1, 0)
+    
+    if cache is not None:
+        cache.record(hits, len(charts) - hits)
+        cache.evict()
+    
+    if failures:
+        print("\n{} chart(s) failed:".format(len(failures)))
+        for kind, name, error in failures:
+            print("    {} ({}): {}".format(name, kind, error))
+    
+    return failures
@@ -4,38 +4,116 @@ process data
 """
 
 import numpy as np
+from functools import lru_cache
+from itertools import chain
 
-def combineNames(names1, names2):
-    '''Makes a single list of each name appearing in either list'''
-    namesOut = names1
-    for name in names2:
-        if name not in names1:
-            namesOut = np.append(namesOut, name)
-    return namesOut
-
-def dates2num(dates_in):
-    dates_out = []
-    for period in dates_in:
-        year = float(period.split('/')[1])
-        month = float(period.split('/')[0])
-        dates_out.append(year+month/12)
-    return np.asarray(dates_out)
-
-def movingAverage(data, N=3):
-    cumsum, moving_aves = [0], []
-
-    for i, x in enumerate(data, 1):
-        cumsum.append(cumsum[i-1] + x)
-        if i>=N:
-            moving_ave = (cumsum[i] - cumsum[i-N])/N
-            #can do stuff with moving_ave here
-            moving_aves.append(moving_ave)
-    return moving_aves
-
-def makeFigureName(name, fig_type, save_format):
-    fig_prefix = '-'.join(name.lower().split(' '))
-    fig = ''.join([fig_prefix, "-", fig_type,".", save_format])
-    fig = fig.replace(',', '') 
+def to_float_matrix(values, missing = "-", dtype = np.float64):
+    '''
+    Converts an object array which uses a sentinel string for missing
+    values into a typed float array with NaN for each missing value.
+
+    Parameters
+    ----------
+    values : array
+        Object array of numbers and missing values.
+    missing : string
+        Value used to mark missing data.
+    dtype : numpy dtype
+        Float type of the returned array.
+
+    Returns
+    -------
+    out : array
+        Float array with the same shape as values.
+    '''
+    values = np.asarray(values, dtype = object)
+    
+    out = np.full(values.shape, np.nan, dtype = dtype)
+    mask = values != missing
+    out[mask] = values[mask].astype(dtype)
+    
+    return out
+
+def whole_number(num):
+    '''Returns num as an int if it has no fractional part so that it is
+    printed in the same way as the original integer data'''
+    if float(num).is_integer():
+        return int(num)
+    return num
+
+def name_index(names):
+    '''Makes a dictionary giving the row of each name in names so that a
+    trust can be found without comparing against every name. Repeated
+    names map to their first row, matching names == name.'''
+    rows = {}
+    for i, name in enumerate(names):
+        rows.setdefault(name, i)
+    return rows
+
+def trust_universe(*names):
+    '''Makes a single array of each name appearing in any of the lists,
+    in the order the names are first seen'''
+    return np.asarray(list(dict.fromkeys(chain(*names))), dtype = object)
+
+class TimeAxis:
+    '''
+    Date axis of a dataset, parsed once when the data is loaded so that
+    the charts and the text blocks don't need to reparse the dates.
+
+    Attributes
+    ----------
+    dates : list
+        The original dates: "MM/YYYY" strings (A&E), fractional years
+        (beds) or days (covid).
+    times : array
+        dates as datetime64[M] for monthly and quarterly data, or
+        datetime64[D] for daily data.
+    '''
+
+    def __init__(self, dates):
+        self.dates = dates
+        self.fractional_years = None
+
+        dates = np.asarray(dates)
+        if dates.dtype.kind in 'US' or isinstance(dates.flat[0], str):
+            # "MM/YYYY"
+            parts = np.char.partition(dates.astype(str), '/')
+            year = parts[:, 2].astype(int)
+            month = parts[:, 0].astype(int)
+            self.fractional_years = year + month/12
+            self.times = (year - 1970)*12 + month - 1
+        elif dates.dtype.kind in 'fi':
+            self.fractional_years = dates.astype(float)
+            # year + month/12, with December as the following year
+            self.times = np.round(self.fractional_years*12).astype(int) \
+                         - 1970*12 - 1
+        else:
+            self.times = dates.astype('datetime64[D]')
+            return
+        self.times = self.times.astype('datetime64[M]')
+
+    @property
+    def years(self):
+        '''The dates in fractional years, made on first use'''
+        if self.fractional_years is None:
+            year = self.times.astype('datetime64[Y]')
+            start = year.astype(self.times.dtype)
+            end = (year + 1).astype(self.times.dtype)
+            self.fractional_years = year.astype(int) + 1970 \
+                + (self.times - start)/(end - start)
+        return self.fractional_years
+
+@lru_cache(maxsize = None)
+def make_slug(name):
+    '''Lower case, hyphenated form of name used in page URLs and figure
+    names'''
+    slug = '-'.join(name.lower().split(' '))
+    return slug.replace(',', '')
+
+def makeFigureName(slug, fig_type, save_format):
+    '''File name of a figure of the trust with slug, see
+    TrustRegistry.slugs'''
+    fig = ''.join([slug, "-", fig_type,".", save_format])
     
     return fig   
 
@@ -66,99 +144,101 @@ def get_old_trusts(d):
         
     return old_trusts
 
-def capitaliseFirst(string_list):
-    '''Capitalised the first letter of each word in each string in a list
-except NHS which should be in all-caps'''
-    
-    for i, string in enumerate(string_list):
-        words = string.lower().split(" ")
-        words = [word[0].upper() + word[1:] for word in words]
-        string_list[i] = " ".join(words).replace("Nhs", "NHS")
-        
-    return string_list 
+@lru_cache(maxsize = None)
+def capitalise_name(string):
+    '''Capitalises the first letter of each word in string except NHS
+which should be in all-caps'''
+    words = string.lower().split(" ")
+    words = [word[0].upper() + word[1:] for word in words]
+    return " ".join(words).replace("Nhs", "NHS")
 
-def combineAnEData(allData, allNames, merged_trust, mergered_trusts):
-    ''' Combines (adds) the data for given list of trusts. 
-        Combined data is only given for dates at which *all*
-        listed trusts reported numbers.
+class MergeMatrix:
+    '''
+    The merged_trusts dictionary compiled for one dataset into a
+    (merged trust x predecessor) matrix, so that the combined data of
+    every merged trust can be made with a single matrix product.
+
+    Attributes
+    ----------
+    successors : list
+        Merged trusts found in the dataset.
+    columns : array
+        Dataset rows of every trust that makes up a merged trust.
+    own : array
+        1 where a column is the merged trust itself.
+    old : array
+        1 where a column is one of the trusts it was merged from.
     '''
-    # initite total and mask
-    totalData = np.zeros(len(allData[0,:]), dtype = object)
-    
-    try:
-        newTrustData = allData[allNames == merged_trust][0]
-    except:
-        raise Exception("Couldn't find merged Trust: {}".format(merged_trust))
-    
-    newTrustMask = np.asarray(newTrustData != "-")
-    
-    totalData[newTrustMask] = newTrustData[newTrustMask]
     
-    # Add all data together and make mask for dates at while all trusts
-    # provided data.
-    OldDataMask = np.ones(len(totalData), dtype = bool)
-    for oldTrust in mergered_trusts[merged_trust]:
-        
-        assert oldTrust in allNames, "Error: {} data not found".format(oldTrust)
+    def __init__(self, mergered_trusts, rows):
+        self.successors = [name for name in mergered_trusts if name in rows]
         
-        oldTrustData = allData[allNames == oldTrust][0]
-        newMask = np.asarray(oldTrustData != "-")
+        columns = {}
+        for name in self.successors:
+            for trust in [name] + list(mergered_trusts[name]):
+                assert trust in rows, "Error: {} data not found".format(trust)
+                columns.setdefault(rows[trust], len(columns))
+        self.columns = np.fromiter(columns.keys(), dtype = int,
+                                   count = len(columns))
         
-        totalData[newMask] += oldTrustData[newMask]
-        OldDataMask = OldDataMask & newMask
-         
-    finalMask = OldDataMask | newTrustMask
-    #print(len(finalMask), len(totalData))
-    totalData[np.invert(finalMask)] = "-"
+        self.own = np.zeros((len(self.successors), len(columns)))
+        self.old = np.zeros((len(self.successors), len(columns)))
+        for i, name in enumerate(self.successors):
+            self.own[i, columns[rows[name]]] = 1
+            for trust in mergered_trusts[name]:
+                self.old[i, columns[rows[trust]]] = 1
     
-    return totalData, finalMask
+    def combine(self, values, all_old = False):
+        '''
+        Parameters
+        ----------
+        values : array
+            Float data matrix with one row per name in the dataset.
+        all_old : bool
+            If True only give data for dates at which the merged trust
+            or *all* of the old trusts reported numbers, as for the A&E
+            data. Otherwise any one trust reporting is enough, as for the
+            bed data.
 
-def combineBedData(bedData, allNames, merged_trust, mergered_trusts):
-    '''Calculates total number of overnight beds for trusts that merged into 
-    a final merged trust, as stored in the global merged_trusts dictionary'''
-    
-    # initite total and mask
-    totalBeds = np.zeros(len(bedData[0,:]), dtype = object)
-   
-    # Add new trust data
-    newTrustBeds = bedData[allNames == merged_trust][0]
-    
-    totalMask = np.asarray(newTrustBeds != "-")
-    totalBeds[totalMask] += newTrustBeds[totalMask]
-    
-    # Add beds for old trusts
-    for oldTrust in mergered_trusts[merged_trust]:
-        
-        assert oldTrust in allNames, "Error: {} data not found".format(oldTrust)
+        Returns
+        -------
+        merged : dict
+            (combined data, mask) for each merged trust.
+        '''
+        block = np.asarray(values)[self.columns]
+        valid = (~np.isnan(block)).astype(float)
         
-        oldTrustBeds = bedData[allNames == oldTrust][0]
-        newMask  = np.asarray(oldTrustBeds != "-")
-        totalBeds[newMask] += oldTrustBeds[newMask]
+        totals = (self.own + self.old) @ np.nan_to_num(block)
         
-        totalMask = totalMask | newMask
+        if all_old:
+            mask = (self.own @ valid > 0) | \
+                (self.old @ valid == self.old.sum(axis = 1)[:, None])
+        else:
+            mask = (self.own + self.old) @ valid > 0
+        totals[~mask] = np.nan
         
-    totalBeds[np.invert(totalMask)] = "-"
-    
-    return totalBeds
+        return {name: (totals[i], mask[i])
+                for i, name in enumerate(self.successors)}
 
-def bed_change_per_trust(names, bed_data, mergered_trusts):
+def bed_change_per_trust(names, bed_data, mergered_trusts, merged = None):
     better = 0
     worse = 0
     same = 0
     
-    oldTrusts = get_all_dict_values(mergered_trusts)
+    if merged is None:
+        matrix = MergeMatrix(mergered_trusts, name_index(names))
+        merged = matrix.combine(bed_data)
+    
+    oldTrusts = set(get_all_dict_values(mergered_trusts))
     numTrusts = 0
     for i, name in enumerate(names):
         if name != "England" and name not in oldTrusts:
             if name not in mergered_trusts.keys():
                 trust_beds = bed_data[i]
             else:
-                trust_beds = combineBedData(bed_data, 
-                                            names, 
-                                            name,
-                                            mergered_trusts)
+                trust_beds = merged[name][0]
             
-            trust_beds = trust_beds[trust_beds!='-']
+            trust_beds = trust_beds[~np.isnan(trust_beds)]
             
             if len(trust_beds) >= 2:
                 numTrusts += 1
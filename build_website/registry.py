@@ -0,0 +1,130 @@
+'''
+Registry of every trust name used in the website
+'''
+
+import os
+import json
+import hashlib
+
+# local packages
+import build_website.process_data as proc
+
+# bump when the way names are normalised changes to invalidate old caches
+registry_version = 1
+
+class TrustRegistry:
+    '''
+    Canonical names, URL/figure slugs and the row of each trust in every
+    dataset. Each source name is only normalised once, when the registry
+    is built, and the registry is cached on disk keyed by the hash of the
+    source names.
+
+    Attributes
+    ----------
+    key : string
+        Hash of the source names the registry was built from.
+    aliases : dict
+        For each dataset, the canonical name of each source name, e.g.
+        "barts health nhs trust" -> "Barts Health NHS Trust".
+    slugs : dict
+        Slug used in the page URL and figure names of each canonical name.
+    rows : dict
+        For each dataset, the row of each canonical name.
+    '''
+
+    def __init__(self, key, aliases, slugs, rows):
+        self.key = key
+        self.aliases = aliases
+        self.slugs = slugs
+        self.rows = rows
+
+    def canonical(self, dataset, names):
+        '''Returns the canonical form of a list of source names'''
+        aliases = self.aliases[dataset]
+        return [aliases[name] for name in names]
+
+    def to_json(self):
+        return {"version": registry_version,
+                "key": self.key,
+                "aliases": self.aliases,
+                "slugs": self.slugs,
+                "rows": self.rows}
+
+def hash_names(sources, capitalise):
+    '''
+    Parameters
+    ----------
+    sources : dict
+        Source names of each dataset.
+    capitalise : list
+        Datasets whose names need capitalising.
+
+    Returns
+    -------
+    key : string
+        Hash of all the names, used as the registry cache key.
+    '''
+    sha = hashlib.sha1(str(registry_version).encode())
+    for dataset in sorted(sources):
+        sha.update(dataset.encode() + b"*"*(dataset in capitalise))
+        for name in sources[dataset]:
+            sha.update(b"\0" + str(name).encode())
+    return sha.hexdigest()
+
+def build_registry(sources, capitalise):
+    '''
+    Parameters
+    ----------
+    sources : dict
+        Source names of each dataset.
+    capitalise : list
+        Datasets whose names need capitalising to match the A&E data.
+
+    Returns
+    -------
+    registry : TrustRegistry
+    '''
+    aliases, slugs, rows = {}, {}, {}
+
+    for dataset, names in sources.items():
+        aliases[dataset], rows[dataset] = {}, {}
+        for i, name in enumerate(names):
+            if dataset in capitalise:
+                canonical = proc.capitalise_name(name)
+            else:
+                canonical = name
+            aliases[dataset][name] = canonical
+            if canonical not in slugs:
+                slugs[canonical] = proc.make_slug(canonical)
+            # first row wins, as with names == name
+            rows[dataset].setdefault(canonical, i)
+
+    return TrustRegistry(hash_names(sources, capitalise), aliases, slugs, rows)
+
+def load_registry(sources, capitalise, cache_dir = None):
+    '''
+    Returns the registry for the given source names, reading it from
+    cache_dir if the names haven't changed since it was saved and saving
+    it there otherwise. No cache is used if cache_dir is None.
+    '''
+    if cache_dir is None:
+        return build_registry(sources, capitalise)
+
+    cache_file = os.path.join(cache_dir, "trust_registry.json")
+    key = hash_names(sources, capitalise)
+
+    if os.path.isfile(cache_file):
+        with open(cache_file) as file:
+            cached = json.load(file)
+        if cached.get("version") == registry_version and cached["key"] == key:
+            return TrustRegistry(key, cached["aliases"], cached["slugs"],
+                                 cached["rows"])
+
+    registry = build_registry(sources, capitalise)
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    with open(cache_file, "w") as file:
+        json.dump(registry.to_json(), file)
+
+    return registry
@@ -0,0 +1,112 @@
+'''
+Rolling window statistics of whole data matrices
+
+Each function works along the last axis of a 1-D series or a 2-D matrix
+with one row per trust, so that every trust in a dataset is smoothed in
+a single call. Windows run in array order (the NHS data is stored newest
+first) and the result has the same shape as the input, with NaN wherever
+there is no complete window.
+
+window
+    "trailing" puts each result at the last point of its window,
+    "centred" at the middle point (N odd) or just before it (N even).
+gaps
+    "skip" runs the windows over the reported (non-NaN) points only, as
+    if the missing points weren't there. "propagate" gives NaN for any
+    window which includes a missing point.
+'''
+
+import numpy as np
+
+def compact(values):
+    '''
+    Moves the valid (non-NaN) values of each row to the front, keeping
+    their order.
+
+    Returns
+    -------
+    packed : array
+        Valid values followed by NaN.
+    order : array
+        Column each packed value came from.
+    counts : array
+        Number of valid values in each row.
+    '''
+    valid = ~np.isnan(values)
+    order = np.argsort(~valid, axis = -1, kind = 'stable')
+    packed = np.take_along_axis(values, order, axis = -1)
+    return packed, order, valid.sum(axis = -1)
+
+def offset(N, window):
+    '''Position of the result within a window of N points'''
+    if window == "trailing":
+        return N - 1
+    elif window == "centred":
+        return (N - 1)//2
+    raise ValueError("Unknown window: {}".format(window))
+
+def window_sums(values, N):
+    '''Sum of every N consecutive values, with the number of NaN in each
+    window. Both have M - N + 1 columns for M input columns.'''
+    zero = np.zeros(values.shape[:-1] + (1,))
+    total = np.concatenate((zero, np.cumsum(np.nan_to_num(values), axis = -1)),
+                           axis = -1)
+    missing = np.concatenate((zero, np.cumsum(np.isnan(values), axis = -1)),
+                             axis = -1)
+    return total[..., N:] - total[..., :-N], missing[..., N:] - missing[..., :-N]
+
+def rolling_sum(values, N, window = "trailing", gaps = "skip"):
+    '''
+    Parameters
+    ----------
+    values : array
+        Float series or matrix, NaN for missing values.
+    N : int
+        Number of points in each window.
+    window : string
+        "trailing" or "centred".
+    gaps : string
+        "skip" or "propagate".
+
+    Returns
+    -------
+    out : array
+        Sum of each window, the same shape as values.
+    '''
+    values = np.asarray(values, dtype = np.float64)
+    out = np.full(values.shape, np.nan)
+    if N > values.shape[-1]:
+        return out
+    shift = offset(N, window)
+
+    if gaps == "skip":
+        packed, order, counts = compact(values)
+        sums, _ = window_sums(packed, N)
+        # only windows made entirely of valid points
+        complete = np.arange(sums.shape[-1]) <= counts[..., None] - N
+        columns = order[..., shift:shift + sums.shape[-1]]
+        np.put_along_axis(out, columns, np.where(complete, sums, np.nan),
+                          axis = -1)
+    elif gaps == "propagate":
+        sums, missing = window_sums(values, N)
+        sums[missing > 0] = np.nan
+        out[..., shift:shift + sums.shape[-1]] = sums
+    else:
+        raise ValueError("Unknown gap handling: {}".format(gaps))
+
+    return out
+
+def rolling_mean(values, N, window = "trailing", gaps = "skip"):
+    '''Mean of each window, see rolling_sum'''
+    return rolling_sum(values, N, window, gaps)/N
+
+def first_valid(values):
+    '''First non-NaN value of each row, NaN if there are none'''
+    valid = ~np.isnan(values)
+    first = np.take_along_axis(values, valid.argmax(axis = -1)[..., None],
+                               axis = -1)[..., 0]
+    return np.where(valid.any(axis = -1), first, np.nan)
+
+def last_valid(values):
+    '''Last non-NaN value of each row, NaN if there are none'''
+    return first_valid(values[..., ::-1])
@@ -0,0 +1,201 @@
+'''
+Per-trust summary of every dataset, used to decide what goes on each page
+'''
+
+import numpy as np
+
+# local packages
+import build_website.process_data as proc
+import build_website.rolling as rolling
+
+summary_dtype = np.dtype([
+    # number of A&E waiting and bed data points reported by the trust itself
+    ("ane_points", np.int32),
+    ("bed_points", np.int32),
+    # which blocks the trust page needs (see build_website.whichChunks)
+    ("ane_block", np.bool_),
+    ("bed_block", np.bool_),
+    ("covid_block", np.bool_),
+    # old trusts are only shown as part of the trust they merged into
+    ("old_trust", np.bool_),
+    ("merged", np.bool_),
+    # A&E text, using the combined data for merged trusts
+    ("att_points", np.int32),
+    ("av_attendance", np.float64),
+    ("smooth_max", np.float64),
+    ("smooth_diff", np.float64),
+    ("first_year", np.float64),
+    # bed text, using the combined data for merged trusts
+    ("beds_newest", np.float64),
+    ("beds_oldest", np.float64),
+    ("beds_start", np.float64),
+    ])
+
+class TrustSummary:
+    '''
+    Structured array with one summary_dtype record per trust, built once
+    per build. summary[name] gives the record for a trust.
+
+    Attributes
+    ----------
+    names : array
+        Every trust name in the website.
+    table : array
+        Summary record of each name.
+    rows : dict
+        Row of each name in table.
+    '''
+
+    def __init__(self, names, table):
+        self.names = names
+        self.table = table
+        self.rows = proc.name_index(names)
+
+    def __getitem__(self, name):
+        return self.table[self.rows[name]]
+
+    def __contains__(self, name):
+        return name in self.rows
+
+class NationalBeds:
+    '''
+    Bed figures shared by every trust page and the pie chart, made once
+    per build.
+
+    Attributes
+    ----------
+    more, same, fewer : float
+        Percentage of trusts with more, about the same and fewer beds than
+        when they first reported (see process_data.bed_change_per_trust).
+    england_change : number
+        Number of beds lost in England since the oldest figure.
+    england_change_perc : float
+        england_change as a percentage of the first England figure.
+    '''
+
+    def __init__(self, more, same, fewer, england_change, england_change_perc):
+        self.more = more
+        self.same = same
+        self.fewer = fewer
+        self.england_change = england_change
+        self.england_change_perc = england_change_perc
+
+def national_beds(beds, mergers):
+    '''
+    Parameters
+    ----------
+    beds : Dataset
+        Overnight bed data, England in the first row.
+    mergers : dict
+        Old trusts of each merged trust.
+
+    Returns
+    -------
+    national : NationalBeds
+    '''
+    names, _, values = beds
+    more, same, fewer = proc.bed_change_per_trust(names, values, mergers,
+                                                  beds.merged(2))
+
+    england = values[0]
+    england_change = proc.whole_number(england[-1] - england[0])
+    england_change_perc = (england[-1] - england[0])/england[0]*100
+
+    return NationalBeds(more, same, fewer, england_change, england_change_perc)
+
+def dataset_rows(dataset, rows):
+    '''Rows of the dataset and the matching rows of the summary table'''
+    src = np.fromiter(dataset.rows.values(), dtype = int,
+                      count = len(dataset.rows))
+    dst = np.fromiter((rows[name] for name in dataset.rows), dtype = int,
+                      count = len(dataset.rows))
+    return src, dst
+
+def summarise_waiting(data, table, rows, N = 3):
+    dates = data.waiting.axis.years
+    src, dst = dataset_rows(data.waiting, rows)
+
+    att = data.waiting.combined(2, all_old = True)[src]
+    wait = data.waiting.combined(3, all_old = True)[src]
+
+    att_points = np.count_nonzero(~np.isnan(att), axis = 1)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        av_att = np.nansum(att, axis = 1)/att_points
+    av_att[att_points == 0] = np.nan
+
+    # N point moving average over the valid waiting points of each trust
+    smooth, _ = data.waiting.smoothed(3, N, all_old = True)
+    smooth = smooth[src]
+    smooth_max = np.max(np.nan_to_num(smooth, nan = -np.inf), axis = 1)
+    smooth_max[np.isnan(smooth).all(axis = 1)] = np.nan
+    smooth_diff = rolling.first_valid(smooth) - rolling.last_valid(smooth)
+
+    first_year = np.where(~np.isnan(wait), dates[None, :], np.inf).min(axis = 1)
+    first_year[np.isnan(wait).all(axis = 1)] = np.nan
+
+    table["att_points"][dst] = att_points
+    table["av_attendance"][dst] = av_att
+    table["smooth_max"][dst] = smooth_max
+    table["smooth_diff"][dst] = smooth_diff
+    table["first_year"][dst] = first_year
+
+def summarise_beds(data, table, rows):
+    dates = data.beds.axis.years
+    src, dst = dataset_rows(data.beds, rows)
+
+    packed, order, counts = rolling.compact(data.beds.combined(2)[src])
+    index = np.arange(len(packed))
+    last = np.clip(counts - 1, 0, None)
+    found = counts > 0
+
+    table["beds_newest"][dst] = np.where(found, packed[:, 0], np.nan)
+    table["beds_oldest"][dst] = np.where(found, packed[index, last], np.nan)
+    table["beds_start"][dst] = np.where(found, dates[order[index, last]],
+                                        np.nan)
+
+def summarise(data, names):
+    '''
+    Parameters
+    ----------
+    data : DataContext
+        All of the datasets.
+    names : array
+        Every trust name to summarise.
+
+    Returns
+    -------
+    summary : TrustSummary
+    '''
+    table = np.zeros(len(names), dtype = summary_dtype)
+    for field in ["av_attendance", "smooth_max", "smooth_diff", "first_year",
+                  "beds_newest", "beds_oldest", "beds_start"]:
+        table[field] = np.nan
+
+    summary = TrustSummary(names, table)
+    rows = summary.rows
+
+    # points reported by each trust itself
+    for dataset, field, points in [(data.waiting, 3, "ane_points"),
+                                   (data.beds, 2, "bed_points")]:
+        src, dst = dataset_rows(dataset, rows)
+        table[points][dst] = np.count_nonzero(~np.isnan(dataset[field][src]),
+                                              axis = 1)
+
+    table["ane_block"] = table["ane_points"] >= 10
+    table["bed_block"] = table["bed_points"] >= 4
+    table["covid_block"][dataset_rows(data.covid, rows)[1]] = True
+
+    # merged trusts also get a block if any of the old trusts had one
+    for name, old_trusts in data.waiting.mergers.items():
+        old_rows = [rows[trust] for trust in old_trusts if trust in rows]
+        table["old_trust"][old_rows] = True
+        if name in rows:
+            row = rows[name]
+            table["merged"][row] = True
+            table["ane_block"][row] |= table["ane_block"][old_rows].any()
+            table["bed_block"][row] |= table["bed_block"][old_rows].any()
+
+    summarise_waiting(data, table, rows)
+    summarise_beds(data, table, rows)
+
+    return summary
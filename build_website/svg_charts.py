@@ -0,0 +1,574 @@
+'''
+Native SVG writer for the trust charts
+
+Writes the A&E waiting, bed and covid charts of the trust pages straight
+from the data with string templates, without building a matplotlib
+figure. The charts follow the layout of the matplotlib versions in
+plot_data: the same colours, moving averages, labels and integer year
+ticks, with the axes scaled to the data in the same way.
+
+Each chart is first laid out as a spec, a dict of plain values (see
+chartSpec), which render turns into SVG. The same specs are written out
+as JSON by chart_data for charts.js to draw in the browser.
+'''
+
+import numpy as np
+from xml.sax.saxutils import escape
+
+# local packages
+from build_website.build_website import mergered_trusts
+
+NHSblue = "#0072CE"
+average_colour = "#e60000"
+bar_colours = ["#004684", "#006BC8", "#39A1FC", "#71BCFE"]
+
+# size of the charts in points, as the 6x4 inch matplotlib figures
+width, height = 432, 288
+font_size = 14
+
+svg_template = '''<?xml version="1.0" encoding="utf-8" standalone="no"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="{width}pt" height="{height}pt" viewBox="0 0 {width} {height}" version="1.1">
+<style>text{{font:{font_size}px 'DejaVu Sans',Verdana,Arial,Helvetica,sans-serif}}</style>
+<rect width="{width}" height="{height}" fill="#fff"/>
+{body}
+</svg>
+'''
+frame_template = '<path d="{}" fill="none" stroke="#000" stroke-width="0.8"/>'
+text_template = '<text x="{}" y="{}"{}>{}</text>'
+line_template = '<polyline points="{}" fill="none" stroke="{}" stroke-width="{}" stroke-linejoin="round"/>'
+points_template = '<g fill="{}" fill-opacity="{}">{}</g>'
+circle_template = '<circle cx="{}" cy="{}" r="{}"/>'
+bars_template = '<g fill="{}">{}</g>'
+rect_template = '<rect x="{}" y="{}" width="{}" height="{}"/>'
+
+def fmt(value):
+    '''Coordinate to 0.1 pt, without trailing zeros'''
+    text = "{:.1f}".format(value).rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+class Frame:
+    '''
+    Plotting area of a chart and the data range shown in it.
+
+    Attributes
+    ----------
+    left, right, top, bottom : float
+        Edges of the plotting area in points.
+    xlim, ylim : tuple
+        Data values at the edges of the plotting area.
+    '''
+
+    def __init__(self, left, right, top, bottom, xlim, ylim):
+        self.left, self.right = left, right
+        self.top, self.bottom = top, bottom
+        self.xlim, self.ylim = xlim, ylim
+
+    def x(self, values):
+        lo, hi = self.xlim
+        return self.left + (np.asarray(values, dtype = float) - lo) \
+            *(self.right - self.left)/(hi - lo)
+
+    def y(self, values):
+        lo, hi = self.ylim
+        return self.bottom - (np.asarray(values, dtype = float) - lo) \
+            *(self.bottom - self.top)/(hi - lo)
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(*spec["box"], spec["xlim"], spec["ylim"])
+
+def make_label(name):
+    ''' 
+    Reduces NHS trust name to key part
+        i.e Removes words like "NHS", "Trust", "Of", "Foundation" etc...
+
+    Parameters
+    ----------
+    name : string
+        NHS trust full name.
+
+    Returns
+    -------
+    label : string
+        Shortened NHS trust name.
+    '''
+    
+    remove = ["Trust", "Foundation", "NHS","University", "Hospital",
+              "Hospitals", "Of"]
+    
+    def check(word):
+        if word in remove:
+            return False
+        else:
+            return True
+    
+    words = np.asarray(name.split(" "))
+    
+    filtered_words = filter(check, words)
+    
+    label = ' '.join(filtered_words)
+    
+    return label
+
+def autoscale(lo, hi, margin = 0.05):
+    '''Data limits with matplotlib's default 5% margins'''
+    if hi == lo:
+        pad = abs(lo)*margin or 1
+    else:
+        pad = (hi - lo)*margin
+    return lo - pad, hi + pad
+
+def nice_ticks(lo, hi, length):
+    '''
+    Round tick values between lo and hi, as matplotlib's default
+    locator: steps of 1, 2, 2.5 or 5 times a power of ten, with at most
+    one tick for every two lines of text along an axis length points long.
+
+    Returns
+    -------
+    ticks : array
+
+    decimals : int
+        Decimal places needed to label the ticks.
+    '''
+    bins = max(1, int(length//(2*font_size)))
+    raw = (hi - lo)/bins
+    magnitude = 10**np.floor(np.log10(raw))
+    step = next(s*magnitude for s in [1, 2, 2.5, 5, 10]
+                if s*magnitude >= raw*(1 - 1e-9))
+    first = np.ceil(lo/step - 1e-9)*step
+    ticks = np.arange(first, hi + step*1e-9, step)
+
+    decimals = max(0, -int(np.floor(np.log10(step) + 1e-9)))
+    if abs(round(step, decimals) - step) > step*1e-9:
+        decimals += 1
+    return ticks, decimals
+
+def year_ticks(years):
+    '''Integer year ticks covering years, as plot_data.fix_xticks'''
+    xup = int(np.ceil(max(years))) + 1
+    xdown = int(np.floor(min(years)))
+    return np.arange(xdown, xup, 2*(xup - xdown > 5) + 1*(xup - xdown <= 5))
+
+def year_limits(years, ticks):
+    '''x limits of a chart: its data with margins, stretched to its ticks
+    as matplotlib does when the ticks are set'''
+    lo, hi = autoscale(min(years), max(years))
+    return min(lo, ticks[0]), max(hi, ticks[-1])
+
+def legend_box(frame, entries, loc):
+    '''(left, top, right, bottom) of a legend in the loc corner'''
+    longest = max(len(label) for _, _, label in entries)
+    legend_width = 34 + longest*font_size*0.6
+    legend_height = len(entries)*font_size*1.4
+    if loc.endswith("left"):
+        left = frame.left + 10
+    else:
+        left = frame.right - 10 - legend_width
+    if loc.startswith("upper"):
+        top = frame.top + 8
+    else:
+        top = frame.bottom - 8 - legend_height
+    return left, top, left + legend_width, top + legend_height
+
+def best_corner(frame, entries, xs, ys):
+    '''The corner where the legend covers the fewest of the points
+    (xs, ys), preferring the corners in the same order as matplotlib'''
+    px, py = frame.x(xs), frame.y(ys)
+    def covered(loc):
+        left, top, right, bottom = legend_box(frame, entries, loc)
+        return np.sum((px >= left) & (px <= right)
+                      & (py >= top) & (py <= bottom))
+    return min(["upper right", "upper left", "lower left", "lower right"],
+               key = covered)
+
+####################################################################################################
+###########################################  Chart specs  ##########################################
+####################################################################################################
+
+def frame_spec(frame, layers, spines = "tblr", yticks = None):
+    '''
+    Spec of one set of axes.
+
+    Parameters
+    ----------
+    frame : Frame
+
+    layers : list
+        What is drawn in the frame, in order: dicts with "type" "points"
+        (x, y), "line" (x, y, colour) or "bars" (x, height, bottom, width,
+        colour).
+    spines : string
+        Sides of the frame drawn, any of "tblr".
+    yticks : list
+        Values of the y ticks, by default chosen by nice_ticks.
+    '''
+    decimals = 0
+    if yticks is None:
+        yticks, decimals = nice_ticks(*frame.ylim, frame.bottom - frame.top)
+    return {"box": [frame.left, frame.right, frame.top, frame.bottom],
+            "xlim": list(frame.xlim), "ylim": list(frame.ylim),
+            "spines": spines, "yticks": list(yticks), "ydecimals": decimals,
+            "layers": layers}
+
+def waitingSpec(name, waiting_data, legend_on = True):
+    '''Spec of plot_data.makeAnEgraph'''
+    dates = waiting_data.axis.years
+    i = waiting_data.rows[name]
+
+    waiting = waiting_data.combined(3, all_old = True)[i]
+    mask = ~np.isnan(waiting)
+    smoothWaiting, smoothDates = waiting_data.smoothed(3, 3, all_old = True)
+    smoothMask = ~np.isnan(smoothWaiting[i])
+
+    assert sum(mask) >= 10, "Error: Less than 10 data points for trust:{}".format(name)
+
+    maxWaiting = np.max(waiting[mask])
+    if maxWaiting > 1e5:
+        label, norm = "People waiting over 4 hours\n(millions)", 1e-6
+    elif maxWaiting > 1e3:
+        label, norm = "People waiting over 4 hours\n(thousands)", 1e-3
+    else:
+        label, norm = "People waiting over 4 hours", 1
+    plot_average = maxWaiting >= 10
+
+    values = waiting[mask]*norm
+    averages = smoothWaiting[i][smoothMask]*norm
+    shown = np.concatenate((values, averages)) if plot_average else values
+
+    xticks = year_ticks(dates[mask])
+    xlim = year_limits(dates[mask], xticks)
+    ylim = autoscale(np.min(shown), np.max(shown))
+    frame = Frame(87, 409, 15, 252, xlim, ylim)
+
+    layers = [{"type": "points", "x": dates[mask], "y": values}]
+    if plot_average:
+        layers.append({"type": "line", "x": smoothDates[i][smoothMask],
+                       "y": averages, "colour": average_colour})
+    spec = {"frames": [frame_spec(frame, layers)],
+            "xaxis": {"ticks": list(xticks),
+                      "labels": [str(x) for x in xticks], "rotation": 0},
+            "ylabel": {"text": label, "x": 22 if "\n" in label else 30}}
+    if legend_on and plot_average:
+        spec["legend"] = {"loc": "upper left", "entries":
+                          [["line", average_colour, "3 month average"]]}
+    return spec
+
+def mergedBedsSpec(newName, NHSdata):
+    '''Spec of plot_data.plotMergedBedData'''
+    _, _, beds = NHSdata
+    dates = NHSdata.axis.years
+    rows = NHSdata.rows
+
+    mainData = beds[rows[newName]]
+    mainMask = ~np.isnan(mainData)
+
+    layers, entries = [], []
+    if mainMask.any():
+        layers.append({"type": "bars", "x": dates[mainMask],
+                       "height": mainData[mainMask], "bottom": 0,
+                       "width": 0.2, "colour": bar_colours[0]})
+        entries.append(["box", bar_colours[0], make_label(newName)])
+
+    oldDataTotal = np.zeros(len(dates))
+    for n, oldTrustName in enumerate(mergered_trusts[newName]):
+        oldData = beds[rows[oldTrustName]]
+        oldDataMask = ~np.isnan(oldData)
+        layers.append({"type": "bars", "x": dates[oldDataMask],
+                       "height": oldData[oldDataMask],
+                       "bottom": oldDataTotal[oldDataMask].copy(),
+                       "width": 0.2, "colour": bar_colours[n + 1]})
+        entries.append(["box", bar_colours[n + 1], make_label(oldTrustName)])
+        oldDataTotal[oldDataMask] += oldData[oldDataMask]
+
+    top = (1.2 + len(mergered_trusts[newName])/10) \
+        *max(max(oldDataTotal[oldDataMask]), max(mainData[mainMask]))
+    combined, _ = NHSdata.merged(2)[newName]
+    xticks = year_ticks(dates[~np.isnan(combined)])
+    shown = np.concatenate((dates[mainMask], dates[oldDataTotal > 0]))
+    xlim = year_limits(np.concatenate((shown - 0.1, shown + 0.1)), xticks)
+    frame = Frame(87, 409, 15, 252, xlim, (0, top))
+
+    return {"frames": [frame_spec(frame, layers)],
+            "xaxis": {"ticks": list(xticks),
+                      "labels": [str(x) for x in xticks], "rotation": 0},
+            "ylabel": {"text": "Total # of Available Beds", "x": 30},
+            "legend": {"loc": "upper left", "entries": entries}}
+
+def bedsSpec(name, NHSdata):
+    '''Spec of plot_data.plotBeds'''
+    if name in mergered_trusts.keys():
+        return mergedBedsSpec(name, NHSdata)
+
+    _, _, all_beds = NHSdata
+    beds = all_beds[NHSdata.rows[name]]
+    mask = ~np.isnan(beds)
+    dates = NHSdata.axis.years[mask]
+    beds = beds[mask]
+
+    rescale = 1/1000 if max(beds) > 1000 else 1
+    label = "# of Overnight Beds" + "\n(Thousands)"*(rescale==1/1000)
+
+    xticks = year_ticks(dates)
+    xlim = year_limits(np.concatenate((dates - 0.09, dates + 0.09)), xticks)
+    left, right, top, bottom = 87, 409, 15, 252
+    layers = [{"type": "bars", "x": dates, "height": beds*rescale,
+               "bottom": 0, "width": 0.18, "colour": NHSblue}]
+    spec = {"xaxis": {"ticks": list(xticks),
+                      "labels": [str(x) for x in xticks], "rotation": 0}}
+
+    if min(beds) > 300 and (max(beds) - min(beds)) < min(beds)/3:
+        # broken axis: a short panel at zero under the range of the data,
+        # with the panel heights in proportion to the ranges they show
+        lower = (0, 0.005*max(beds)*rescale)
+        upper = (0.95*min(beds)*rescale, 1.02*max(beds)*rescale)
+        gap = 0.08*(bottom - top)/2
+        split = bottom - (bottom - top - gap)*(lower[1] - lower[0]) \
+            /(upper[1] - upper[0] + lower[1] - lower[0])
+        spec["frames"] = [
+            frame_spec(Frame(left, right, top, split - gap, xlim, upper),
+                       layers, "l"),
+            frame_spec(Frame(left, right, split, bottom, xlim, lower),
+                       layers, "lb", yticks = [0])]
+        spec["breaks"] = [split - gap, split]
+        spec["ylabel"] = {"text": label, "x": 16 if "\n" in label else 24}
+    else:
+        frame = Frame(left, right, top, bottom, xlim,
+                      (0, 1.1*max(beds)*rescale))
+        spec["frames"] = [frame_spec(frame, layers)]
+        spec["ylabel"] = {"text": label, "x": 22 if "\n" in label else 30}
+    return spec
+
+def covidSpec(name, data, legend_on = True):
+    '''Spec of plot_data.makeCovidGraph, with the dates in days since
+    1970'''
+    _, _, deaths = data
+    dates = data.axis.times.astype('datetime64[D]')
+    i = data.rows[name]
+    trustDeaths = deaths[i]
+
+    smoothDeaths, _ = data.smoothed(2, 7, window = "centred",
+                                    gaps = "propagate", trim = 3)
+    smoothMask = ~np.isnan(smoothDeaths[i])
+    mask = ~np.isnan(trustDeaths)
+
+    days = dates.astype(float)
+    shown = trustDeaths[mask]
+    ylim = autoscale(np.min(shown), np.max(shown)) if len(shown) else (0, 1)
+    frame = Frame(68, 417, 15, 238, autoscale(days.min(), days.max()), ylim)
+
+    # a tick at the start of each month, every other month over a year
+    months = np.arange(dates.min().astype('datetime64[M]'),
+                       dates.max().astype('datetime64[M]') + 1)
+    if len(months) > 12:
+        months = months[::2]
+    xticks = months.astype('datetime64[D]')
+
+    layers = [{"type": "points", "x": days[mask], "y": shown},
+              {"type": "line", "x": days[smoothMask],
+               "y": smoothDeaths[i][smoothMask], "colour": average_colour}]
+    spec = {"frames": [frame_spec(frame, layers)],
+            "xaxis": {"ticks": list(xticks.astype(float)),
+                      "labels": [month.item().strftime('%b')
+                                 for month in xticks],
+                      "rotation": 35},
+            "ylabel": {"text": "Daily Covid-19 Deaths", "x": 24}}
+    if legend_on:
+        entries = [["line", average_colour, "Weekly Average"]]
+        loc = best_corner(frame, entries,
+                          np.concatenate((days[mask], days[smoothMask])),
+                          np.concatenate((shown, smoothDeaths[i][smoothMask])))
+        spec["legend"] = {"loc": loc, "entries": entries}
+    return spec
+
+def chartSpec(kind, name, data):
+    '''
+    Layout of the "waiting", "beds" or "covid" chart of trust name.
+
+    Returns
+    -------
+    spec : dict
+        "frames": list of frame_spec, the first one at the top
+        "xaxis": ticks, labels and rotation of the labels, drawn under
+            the last frame
+        "ylabel": text of the y label and its x position
+        "legend": loc and entries of the legend in the first frame,
+            optional, see legend
+        "breaks": y positions of the marks of a broken y axis, optional
+    '''
+    if kind == "waiting":
+        return waitingSpec(name, data.waiting)
+    elif kind == "beds":
+        return bedsSpec(name, data.beds)
+    elif kind == "covid":
+        return covidSpec(name, data.covid)
+    raise ValueError("Unknown chart: {}".format(kind))
+
+####################################################################################################
+###########################################  SVG writer  ###########################################
+####################################################################################################
+
+def polyline(frame, xs, ys, colour, lw = 2):
+    points = " ".join("{},{}".format(fmt(x), fmt(y))
+                      for x, y in zip(frame.x(xs), frame.y(ys)))
+    return line_template.format(points, colour, lw)
+
+def points(frame, xs, ys, colour = "#0000ff", alpha = 0.2, r = 3):
+    '''Points as matplotlib's '.' markers of size 10'''
+    circles = "".join(circle_template.format(fmt(x), fmt(y), r)
+                      for x, y in zip(frame.x(xs), frame.y(ys)))
+    return points_template.format(colour, alpha, circles)
+
+def bars(frame, xs, heights, bottoms, bar_width, colour):
+    xs = np.asarray(xs, dtype = float)
+    bottoms = np.broadcast_to(bottoms, xs.shape)
+    x0 = frame.x(xs - bar_width/2)
+    x1 = frame.x(xs + bar_width/2)
+    # clip to the plotting area, for the broken axes
+    y0 = np.clip(frame.y(bottoms), frame.top, frame.bottom)
+    y1 = np.clip(frame.y(bottoms + np.asarray(heights, dtype = float)),
+                 frame.top, frame.bottom)
+    rects = "".join(rect_template.format(fmt(a), fmt(top), fmt(b - a),
+                                         fmt(bottom - top))
+                    for a, b, top, bottom in zip(x0, x1, y1, y0)
+                    if bottom > top)
+    return bars_template.format(colour, rects)
+
+def layer(frame, spec):
+    '''SVG of one of the layers of a frame_spec'''
+    if spec["type"] == "points":
+        return points(frame, spec["x"], spec["y"])
+    elif spec["type"] == "line":
+        return polyline(frame, spec["x"], spec["y"], spec["colour"])
+    elif spec["type"] == "bars":
+        return bars(frame, spec["x"], spec["height"], spec["bottom"],
+                    spec["width"], spec["colour"])
+    raise ValueError("Unknown layer: {}".format(spec["type"]))
+
+def xaxis(frame, ticks, labels, rotation = 0):
+    '''Ticks and tick labels along the bottom of the frame'''
+    parts = []
+    path = []
+    for x, label in zip(frame.x(ticks), labels):
+        if not frame.left - 0.1 <= x <= frame.right + 0.1:
+            continue
+        path.append("M{} {}v3.5".format(fmt(x), fmt(frame.bottom)))
+        y = frame.bottom + 3.5 + 3.5 + font_size
+        if rotation:
+            parts.append(text_template.format(
+                fmt(x), fmt(y),
+                ' text-anchor="end" transform="rotate({} {} {})"'.format(
+                    -rotation, fmt(x), fmt(y - font_size*0.6)),
+                escape(label)))
+        else:
+            parts.append(text_template.format(fmt(x), fmt(y),
+                                              ' text-anchor="middle"',
+                                              escape(label)))
+    if path:
+        parts.insert(0, frame_template.format("".join(path)))
+    return parts
+
+def yaxis(frame, ticks, decimals):
+    '''Ticks and tick labels along the left of the frame'''
+    parts, path = [], []
+    for y, value in zip(frame.y(ticks), ticks):
+        if not frame.top - 0.1 <= y <= frame.bottom + 0.1:
+            continue
+        path.append("M{} {}h-3.5".format(fmt(frame.left), fmt(y)))
+        # + 0 so that -0.0 is labelled 0
+        label = "{:.{}f}".format(round(value, decimals) + 0, decimals)
+        parts.append(text_template.format(fmt(frame.left - 3.5 - 3.5),
+                                          fmt(y + font_size*0.35),
+                                          ' text-anchor="end"', label))
+    if path:
+        parts.insert(0, frame_template.format("".join(path)))
+    return parts
+
+def ylabel(text, x, middle):
+    '''Vertical axis label, one tspan per line'''
+    lines = text.split("\n")
+    spans = "".join('<tspan x="0" dy="{}">{}</tspan>'.format(
+        "0" if n == 0 else "1.2em", escape(line))
+        for n, line in enumerate(lines))
+    return '<text transform="translate({} {}) rotate(-90)" ' \
+        'text-anchor="middle">{}</text>'.format(fmt(x), fmt(middle), spans)
+
+def box(frame, sides = "tblr"):
+    '''Axes spines of the frame'''
+    l, r = fmt(frame.left), fmt(frame.right)
+    t, b = fmt(frame.top), fmt(frame.bottom)
+    lines = {"t": "M{} {}H{}".format(l, t, r),
+             "b": "M{} {}H{}".format(l, b, r),
+             "l": "M{} {}V{}".format(l, t, b),
+             "r": "M{} {}V{}".format(r, t, b)}
+    return frame_template.format("".join(lines[side] for side in sides))
+
+def legend(frame, entries, loc = "upper left"):
+    '''
+    Legend in a corner of the frame.
+
+    Parameters
+    ----------
+    entries : list
+        (style, colour, label) of each entry, style "line" or "box".
+    loc : string
+        "upper left", "upper right", "lower left" or "lower right".
+    '''
+    parts = []
+    x, y, _, _ = legend_box(frame, entries, loc)
+    for style, colour, label in entries:
+        middle = y + font_size/2
+        if style == "line":
+            parts.append('<path d="M{} {}h28" stroke="{}" stroke-width="2"/>'
+                         .format(fmt(x), fmt(middle), colour))
+        else:
+            parts.append('<rect x="{}" y="{}" width="28" height="10" '
+                         'fill="{}"/>'.format(fmt(x), fmt(middle - 5), colour))
+        parts.append(text_template.format(fmt(x + 34),
+                                          fmt(middle + font_size*0.35),
+                                          "", escape(label)))
+        y += font_size*1.4
+    return parts
+
+def render(spec):
+    '''
+    SVG of a chart spec, see chartSpec.
+
+    Returns
+    -------
+    svg : string
+    '''
+    frames = [Frame.from_spec(frame) for frame in spec["frames"]]
+    parts = []
+    for frame, frame_spec in zip(frames, spec["frames"]):
+        parts += [layer(frame, layer_spec) for layer_spec in frame_spec["layers"]]
+    for frame, frame_spec in zip(frames, spec["frames"]):
+        parts.append(box(frame, frame_spec["spines"]))
+        parts += yaxis(frame, frame_spec["yticks"], frame_spec["ydecimals"])
+
+    xaxis_spec = spec["xaxis"]
+    parts += xaxis(frames[-1], xaxis_spec["ticks"], xaxis_spec["labels"],
+                   xaxis_spec["rotation"])
+    if "breaks" in spec:
+        # diagonal break marks on the left axis
+        parts.append(frame_template.format("".join(
+            "M{} {}l6 -6".format(fmt(frames[0].left - 3), fmt(y + 3))
+            for y in spec["breaks"])))
+    parts.append(ylabel(spec["ylabel"]["text"], spec["ylabel"]["x"],
+                        (frames[0].top + frames[-1].bottom)/2))
+    if "legend" in spec:
+        parts += legend(frames[0], spec["legend"]["entries"],
+                        spec["legend"]["loc"])
+
+    return svg_template.format(width = width, height = height,
+                               font_size = font_size, body = "\n".join(parts))
+
+def makeChart(kind, name, data):
+    '''
+    SVG of the "waiting", "beds" or "covid" chart of trust name.
+
+    Returns
+    -------
+    svg : string
+    '''
+    return render(chartSpec(kind, name, data))
@@ -0,0 +1,23 @@
+'''
+Pools of worker processes used to make the charts and the pages
+'''
+
+import multiprocessing
+
+# how worker processes are started. None to fork them where the platform
+# can, so that they share the datasets without copying them, and spawn
+# them otherwise
+start_method = None
+
+def workerPool(jobs, initializer, initargs):
+    '''
+    Pool of jobs worker processes, each set up by calling
+    initializer(*initargs). Spawned workers get a pickled copy of
+    initargs.
+    '''
+    method = start_method
+    if method is None:
+        methods = multiprocessing.get_all_start_methods()
+        method = "fork" if "fork" in methods else "spawn"
+    context = multiprocessing.get_context(method)
+    return context.Pool(jobs, initializer = initializer, initargs = initargs)
@@ -0,0 +1,252 @@
+/*
+ * Draws the trust charts of HowsMyNHS in the browser.
+ *
+ * Each <div class="chart" data-src="..." data-chart="..."> is filled with
+ * the SVG of one chart from the trust's chart data, a JSON file of chart
+ * specs written by build_website/chart_data.py. The SVG is the same as
+ * the one written by render in build_website/svg_charts.py, which this
+ * file follows function by function.
+ */
+(function () {
+  "use strict";
+
+  var width = 432, height = 288, fontSize = 14;
+
+  function fmt(value) {
+    var text = value.toFixed(1);
+    if (Number.isInteger(value*4) && !Number.isInteger(value*2)) {
+      // x.25 and x.75 are rounded to even, as python does
+      var tenths = Math.floor(value*10);
+      text = ((tenths % 2 ? tenths + 1 : tenths)/10).toFixed(1);
+    }
+    text = text.replace(/\.0$/, "");
+    return text === "-0" ? "0" : text;
+  }
+
+  function escape(text) {
+    return String(text).replace(/&/g, "&amp;").replace(/</g, "&lt;")
+      .replace(/>/g, "&gt;");
+  }
+
+  function Frame(spec) {
+    this.left = spec.box[0]; this.right = spec.box[1];
+    this.top = spec.box[2]; this.bottom = spec.box[3];
+    this.xlim = spec.xlim; this.ylim = spec.ylim;
+  }
+  Frame.prototype.x = function (value) {
+    return this.left + (value - this.xlim[0])*(this.right - this.left)
+      /(this.xlim[1] - this.xlim[0]);
+  };
+  Frame.prototype.y = function (value) {
+    return this.bottom - (value - this.ylim[0])*(this.bottom - this.top)
+      /(this.ylim[1] - this.ylim[0]);
+  };
+
+  function pathElement(d) {
+    return '<path d="' + d + '" fill="none" stroke="#000" stroke-width="0.8"/>';
+  }
+
+  function text(x, y, attributes, content) {
+    return '<text x="' + x + '" y="' + y + '"' + attributes + '>' +
+      escape(content) + '</text>';
+  }
+
+  function polyline(frame, xs, ys, colour) {
+    var points = xs.map(function (x, i) {
+      return fmt(frame.x(x)) + "," + fmt(frame.y(ys[i]));
+    });
+    return '<polyline points="' + points.join(" ") + '" fill="none" stroke="' +
+      colour + '" stroke-width="2" stroke-linejoin="round"/>';
+  }
+
+  function points(frame, xs, ys) {
+    var circles = xs.map(function (x, i) {
+      return '<circle cx="' + fmt(frame.x(x)) + '" cy="' + fmt(frame.y(ys[i])) +
+        '" r="3"/>';
+    });
+    return '<g fill="#0000ff" fill-opacity="0.2">' + circles.join("") + '</g>';
+  }
+
+  function clip(value, lo, hi) {
+    return Math.min(Math.max(value, lo), hi);
+  }
+
+  function bars(frame, layer) {
+    var rects = layer.x.map(function (x, i) {
+      var bottom = Array.isArray(layer.bottom) ? layer.bottom[i] : layer.bottom;
+      var x0 = frame.x(x - layer.width/2), x1 = frame.x(x + layer.width/2);
+      // clip to the plotting area, for the broken axes
+      var y0 = clip(frame.y(bottom), frame.top, frame.bottom);
+      var y1 = clip(frame.y(bottom + layer.height[i]), frame.top, frame.bottom);
+      if (!(y0 > y1)) {
+        return "";
+      }
+      return '<rect x="' + fmt(x0) + '" y="' + fmt(y1) + '" width="' +
+        fmt(x1 - x0) + '" height="' + fmt(y0 - y1) + '"/>';
+    });
+    return '<g fill="' + layer.colour + '">' + rects.join("") + '</g>';
+  }
+
+  function layer(frame, spec) {
+    if (spec.type === "points") {
+      return points(frame, spec.x, spec.y);
+    } else if (spec.type === "line") {
+      return polyline(frame, spec.x, spec.y, spec.colour);
+    } else if (spec.type === "bars") {
+      return bars(frame, spec);
+    }
+    throw new Error("Unknown layer: " + spec.type);
+  }
+
+  function xaxis(frame, spec) {
+    var parts = [], path = [];
+    spec.ticks.forEach(function (tick, i) {
+      var x = frame.x(tick), y = frame.bottom + 3.5 + 3.5 + fontSize;
+      if (x < frame.left - 0.1 || x > frame.right + 0.1) {
+        return;
+      }
+      path.push("M" + fmt(x) + " " + fmt(frame.bottom) + "v3.5");
+      if (spec.rotation) {
+        parts.push(text(fmt(x), fmt(y), ' text-anchor="end" transform="rotate(' +
+          (-spec.rotation) + ' ' + fmt(x) + ' ' + fmt(y - fontSize*0.6) + ')"',
+          spec.labels[i]));
+      } else {
+        parts.push(text(fmt(x), fmt(y), ' text-anchor="middle"', spec.labels[i]));
+      }
+    });
+    if (path.length) {
+      parts.unshift(pathElement(path.join("")));
+    }
+    return parts;
+  }
+
+  function yaxis(frame, ticks, decimals) {
+    var parts = [], path = [];
+    ticks.forEach(function (value) {
+      var y = frame.y(value);
+      if (y < frame.top - 0.1 || y > frame.bottom + 0.1) {
+        return;
+      }
+      path.push("M" + fmt(frame.left) + " " + fmt(y) + "h-3.5");
+      // without the sign of -0
+      var label = value.toFixed(decimals).replace(/^-(0\.?0*)$/, "$1");
+      parts.push(text(fmt(frame.left - 3.5 - 3.5), fmt(y + fontSize*0.35),
+        ' text-anchor="end"', label));
+    });
+    if (path.length) {
+      parts.unshift(pathElement(path.join("")));
+    }
+    return parts;
+  }
+
+  function ylabel(spec, middle) {
+    var spans = spec.text.split("\n").map(function (line, n) {
+      return '<tspan x="0" dy="' + (n === 0 ? "0" : "1.2em") + '">' +
+        escape(line) + '</tspan>';
+    });
+    return '<text transform="translate(' + fmt(spec.x) + ' ' + fmt(middle) +
+      ') rotate(-90)" text-anchor="middle">' + spans.join("") + '</text>';
+  }
+
+  function box(frame, sides) {
+    var l = fmt(frame.left), r = fmt(frame.right);
+    var t = fmt(frame.top), b = fmt(frame.bottom);
+    var lines = {t: "M" + l + " " + t + "H" + r, b: "M" + l + " " + b + "H" + r,
+                 l: "M" + l + " " + t + "V" + b, r: "M" + r + " " + t + "V" + b};
+    return pathElement(sides.split("").map(function (side) {
+      return lines[side];
+    }).join(""));
+  }
+
+  function legend(frame, spec) {
+    var longest = Math.max.apply(null, spec.entries.map(function (entry) {
+      return entry[2].length;
+    }));
+    var legendWidth = 34 + longest*fontSize*0.6;
+    var legendHeight = spec.entries.length*fontSize*1.4;
+    var x = /left$/.test(spec.loc) ? frame.left + 10
+                                   : frame.right - 10 - legendWidth;
+    var y = /^upper/.test(spec.loc) ? frame.top + 8
+                                    : frame.bottom - 8 - legendHeight;
+    var parts = [];
+    spec.entries.forEach(function (entry) {
+      var middle = y + fontSize/2;
+      if (entry[0] === "line") {
+        parts.push('<path d="M' + fmt(x) + ' ' + fmt(middle) + 'h28" stroke="' +
+          entry[1] + '" stroke-width="2"/>');
+      } else {
+        parts.push('<rect x="' + fmt(x) + '" y="' + fmt(middle - 5) +
+          '" width="28" height="10" fill="' + entry[1] + '"/>');
+      }
+      parts.push(text(fmt(x + 34), fmt(middle + fontSize*0.35), "", entry[2]));
+      y += fontSize*1.4;
+    });
+    return parts;
+  }
+
+  function render(spec) {
+    var frames = spec.frames.map(function (frame) { return new Frame(frame); });
+    var parts = [];
+    spec.frames.forEach(function (frameSpec, i) {
+      frameSpec.layers.forEach(function (layerSpec) {
+        parts.push(layer(frames[i], layerSpec));
+      });
+    });
+    spec.frames.forEach(function (frameSpec, i) {
+      parts.push(box(frames[i], frameSpec.spines));
+      parts = parts.concat(yaxis(frames[i], frameSpec.yticks, frameSpec.ydecimals));
+    });
+    var last = frames[frames.length - 1];
+    parts = parts.concat(xaxis(last, spec.xaxis));
+    if (spec.breaks) {
+      // diagonal break marks on the left axis
+      parts.push(pathElement(spec.breaks.map(function (y) {
+        return "M" + fmt(frames[0].left - 3) + " " + fmt(y + 3) + "l6 -6";
+      }).join("")));
+    }
+    parts.push(ylabel(spec.ylabel, (frames[0].top + last.bottom)/2));
+    if (spec.legend) {
+      parts = parts.concat(legend(frames[0], spec.legend));
+    }
+    return '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 ' + width +
+      ' ' + height + '" width="100%">' +
+      '<style>text{font:' + fontSize + 'px \'DejaVu Sans\',Verdana,Arial,' +
+      'Helvetica,sans-serif}</style><rect width="' + width + '" height="' +
+      height + '" fill="#fff"/>' + parts.join("") + '</svg>';
+  }
+
+  // chart data of each trust, fetched once per page
+  var requests = {};
+
+  function chartData(src) {
+    if (!requests[src]) {
+      requests[src] = fetch(src).then(function (response) {
+        if (!response.ok) {
+          throw new Error(src + ": " + response.status);
+        }
+        return response.json();
+      });
+    }
+    return requests[src];
+  }
+
+  function drawCharts() {
+    var charts = document.querySelectorAll("div.chart[data-src][data-chart]");
+    Array.prototype.forEach.call(charts, function (element) {
+      chartData(element.getAttribute("data-src")).then(function (data) {
+        var spec = data[element.getAttribute("data-chart")];
+        if (spec) {
+          element.innerHTML = render(spec);
+        }
+      }).catch(function (error) {
+        console.error(error);
+      });
+    });
+  }
+
+  if (document.readyState === "loading") {
+    document.addEventListener("DOMContentLoaded", drawCharts);
+  } else {
+    drawCharts();
+  }
+}());
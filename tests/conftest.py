@@ -0,0 +1,31 @@
+'''
+Small made up datasets in the format of the real ones, so that the tests
+don't need the NHS data files.
+'''
+
+import numpy as np
+import pytest
+
+from build_website.datasets import Dataset, DataContext
+from build_website.registry import build_registry
+
+trust_names = ["England", "Airedale NHS Foundation Trust",
+               "Barts Health NHS Trust"]
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    names = np.asarray(trust_names, dtype = object)
+
+    # monthly "MM/YYYY" A&E data, quarterly fractional year beds and
+    # daily covid deaths
+    months = ["{:02d}/{}".format(month%12 + 1, 2015 + month//12)
+              for month in range(24)]
+    waiting = Dataset(names, months, rng.uniform(1e3, 1e4, (3, 24)),
+                      rng.uniform(10, 500, (3, 24)))
+    beds = Dataset(names, 2010 + np.arange(24)/4, rng.uniform(300, 400, (3, 24)))
+    days = np.arange("2020-03-01", "2020-05-01", dtype = "datetime64[D]")
+    covid = Dataset(names, days, rng.poisson(5, (3, len(days))).astype(float))
+    registry = build_registry({"waiting": names, "beds": names,
+                               "covid": names}, capitalise = ())
+    return DataContext(waiting, beds, covid, registry)
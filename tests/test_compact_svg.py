@@ -0,0 +1,30 @@
+import build_website.plot_data as plot_data
+
+def test_collinear_points_are_dropped():
+    path = ["M 0 0", "L 1 0.04", "L 2 0.08", "L 3 0.12", "L 4 0.16",
+            "L 5 0.4"]
+    assert plot_data.simplifyLines(path, 0.05) \
+        == ["M 0 0", "L 4 0.16", "L 5 0.4"]
+
+def test_bends_curves_and_ends_are_kept():
+    path = ["M 0 0", "L 1 0", "L 1 1", "L 1 1", "C 1 2 3 4 5 6", "L 7 7",
+            "L 8 8", "z"]
+    assert plot_data.simplifyLines(path, 0.05) \
+        == ["M 0 0", "L 1 0", "L 1 1", "C 1 2 3 4 5 6", "L 7 7", "L 8 8",
+            "z"]
+
+def test_dropped_points_stay_within_tolerance():
+    # a gentle curve, which each dropped point is checked against
+    path = ["M 0 0"] + ["L {} {}".format(x, round(0.001*x*x, 3))
+                        for x in range(1, 30)]
+    simple = plot_data.simplifyLines(path, 0.05)
+    assert len(simple) < len(path)
+    kept = [[float(v) for v in command[1:].split()] for command in simple]
+    for command in path:
+        point = [float(v) for v in command[1:].split()]
+        assert min(plot_data.segmentDistance(point, a, b)
+                   for a, b in zip(kept, kept[1:])) <= 0.05
+
+def test_compact_svg():
+    svg = '<svg>\n  <path d="M 0.123 0 L 1.04 0 L 2.01 0 L 3 0"/>\n</svg>'
+    assert plot_data.compactSVG(svg) == '<svg>\n<path d="M 0.1 0 L 3 0"/>\n</svg>'
@@ -0,0 +1,43 @@
+import pickle
+import numpy as np
+
+from build_website.datasets import read_store, write_store, waiting_fields
+from tests.conftest import trust_names
+
+def assert_same_dataset(a, b):
+    assert type(a) is type(b)
+    assert len(a) == len(b)
+    for x, y in zip(a, b):
+        np.testing.assert_array_equal(np.asarray(x), np.asarray(y))
+    assert a.rows == b.rows
+    assert a.mergers == b.mergers
+    np.testing.assert_array_equal(a.axis.times, b.axis.times)
+
+def test_rows(data):
+    for i, name in enumerate(trust_names):
+        assert data.waiting.rows[name] == i
+
+def test_dataset_pickles(data):
+    copy = pickle.loads(pickle.dumps(data.waiting))
+    assert_same_dataset(copy, data.waiting)
+
+def test_data_context_pickles(data):
+    # cached tables are kept too, so that worker processes don't remake them
+    data.waiting.smoothed(3, 3)
+    copy = pickle.loads(pickle.dumps(data))
+    for name in ["waiting", "beds", "covid"]:
+        assert_same_dataset(getattr(copy, name), getattr(data, name))
+    assert copy.waiting.smoothed_data.keys() == data.waiting.smoothed_data.keys()
+    np.testing.assert_array_equal(copy.waiting.smoothed(3, 3)[0],
+                                  data.waiting.smoothed(3, 3)[0])
+    assert list(copy.all_names) == list(data.all_names)
+
+def test_store_round_trip(data, tmp_path):
+    names, dates, *values = data.waiting
+    write_store(str(tmp_path), names, dates, values, waiting_fields)
+    store_names, store_dates, *store_values = read_store(str(tmp_path),
+                                                         waiting_fields)
+    assert list(store_names) == trust_names
+    assert list(store_dates) == list(dates)
+    for value, store_value in zip(values, store_values):
+        np.testing.assert_array_equal(store_value, value)
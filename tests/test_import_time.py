@@ -0,0 +1,79 @@
+'''
+Import time of the build stages
+
+Only plot_data loads the plotting libraries, so that building the
+homepage, the trust pages or the chart data (see html_modules) doesn't
+pay for importing matplotlib. checkImportTime checks that this stays so
+by importing each module in a new python process.
+'''
+
+import re
+import sys
+import subprocess
+
+# modules used by the HTML only stages of the build
+html_modules = ("build_website.build_website", "build_website.datasets",
+                "build_website.chart_data")
+
+# packages only the plotting stage should import
+heavy_packages = ("matplotlib", "brokenaxes", "PIL", "pandas")
+
+def importTime(module):
+    '''
+    Parameters
+    ----------
+    module : string
+        Name of the module to import.
+
+    Returns
+    -------
+    seconds : float
+        Time taken to import module, and everything it imports, in a new
+        python process.
+    packages : set
+        Top level packages imported along with it.
+    '''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                             "import " + module],
+                            capture_output = True, text = True, check = True)
+    seconds, packages = 0, set()
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| \s*(\S+)", line)
+        if match is None:
+            continue
+        cumulative, name = match.groups()
+        packages.add(name.split(".")[0])
+        if name == module:
+            seconds = int(cumulative)*1e-6
+    return seconds, packages
+
+def checkImportTime(modules = html_modules, budget = 0.5,
+                    heavy = heavy_packages):
+    '''
+    Checks that none of modules imports a heavy package, or takes more
+    than budget seconds to import.
+
+    Returns
+    -------
+    times : dict
+        Import time in seconds of each module.
+    '''
+    times = {}
+    for module in modules:
+        seconds, packages = importTime(module)
+        loaded = [package for package in heavy if package in packages]
+        assert not loaded, "Error: importing {} loads {}".format(
+            module, ", ".join(loaded))
+        assert seconds <= budget, "Error: importing {} took {:.2f} s, " \
+            "over the {:.2f} s budget".format(module, seconds, budget)
+        times[module] = seconds
+    return times
+
+def test_build_website_import_is_light():
+    # raises if matplotlib (or another plotting package) is imported, or
+    # the import is over budget
+    times = checkImportTime(["build_website.build_website"])
+    assert "build_website.build_website" in times
+
+def test_html_stages_import_is_light():
+    assert set(checkImportTime()) == set(html_modules)
@@ -0,0 +1,68 @@
+import json
+import os
+
+from build_website.build_website import pageKey, whichChunks
+from build_website.manifest import BuildManifest, manifest_version
+from tests.conftest import trust_names
+
+def touch(path):
+    with open(path, "w") as file:
+        file.write("output")
+
+def test_fresh(tmp_path):
+    out_file = str(tmp_path/"chart.svg")
+    manifest = BuildManifest(str(tmp_path/"manifest.json"))
+    assert not manifest.fresh(out_file, "key")
+
+    touch(out_file)
+    manifest.update(out_file, "key")
+    assert manifest.fresh(out_file, "key")
+    assert not manifest.fresh(out_file, "other key")
+
+    # the file has to exist, as well as its key
+    os.remove(out_file)
+    assert not manifest.fresh(out_file, "key")
+
+def test_saved_keys_are_reloaded(tmp_path):
+    path = str(tmp_path/"build"/"manifest.json")
+    out_file = str(tmp_path/"chart.svg")
+    touch(out_file)
+
+    manifest = BuildManifest(path)
+    manifest.update(out_file, "key")
+    manifest.save()
+    assert os.listdir(str(tmp_path/"build")) == ["manifest.json"]
+    assert BuildManifest(path).fresh(out_file, "key")
+
+def test_other_versions_are_ignored(tmp_path):
+    path = str(tmp_path/"manifest.json")
+    out_file = str(tmp_path/"chart.svg")
+    touch(out_file)
+    with open(path, "w") as file:
+        json.dump({"version": manifest_version - 1,
+                   "keys": {out_file: "key"}}, file)
+    assert not BuildManifest(path).fresh(out_file, "key")
+
+def test_report(tmp_path, capsys):
+    manifest = BuildManifest(str(tmp_path/"manifest.json"))
+    manifest.record("charts", 2, 0)
+    manifest.record("charts", 1, 5)
+    manifest.report()
+    assert capsys.readouterr().out \
+        == "Build manifest: charts 3 written, 5 unchanged and skipped.\n"
+
+def test_page_key(data):
+    name = trust_names[1]
+    blocks = whichChunks(name, data)
+    news = {name: [{"title": "News", "date": "2020-05-01"}]}
+    key = pageKey(data, name, blocks, news)
+    assert pageKey(data, name, blocks, news) == key
+    assert pageKey(data, name, blocks, news, "client") != key
+
+    news[name].append({"title": "More news", "date": "2020-05-02"})
+    assert pageKey(data, name, blocks, news) != key
+    key = pageKey(data, name, blocks, news)
+
+    assert blocks[2]
+    data.covid[2][data.covid.rows["England"], -1] += 1
+    assert pageKey(data, name, blocks, news) != key
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import build_website.process_data as proc
+from build_website.datasets import Dataset
+
+nan = np.nan
+
+names = ["England", "New Trust", "Old Trust A", "Old Trust B", "Other Trust"]
+mergers = {"New Trust": ["Old Trust A", "Old Trust B"],
+           "Missing Trust": ["Old Trust C"]}
+values = np.array([[10., 11., 12., 13.],
+                   [nan, nan, nan, 5.],
+                   [1., nan, 3., nan],
+                   [2., 2., nan, nan],
+                   [7., 8., 9., 10.]])
+
+@pytest.fixture
+def matrix():
+    return proc.MergeMatrix(mergers, proc.name_index(names))
+
+def test_only_merged_trusts_in_the_data(matrix):
+    assert matrix.successors == ["New Trust"]
+
+def test_combine_any_reporting(matrix):
+    totals, mask = matrix.combine(values)["New Trust"]
+    np.testing.assert_array_equal(totals, [3., 2., 3., 5.])
+    np.testing.assert_array_equal(mask, [True, True, True, True])
+
+def test_combine_all_old_reporting(matrix):
+    totals, mask = matrix.combine(values, all_old = True)["New Trust"]
+    np.testing.assert_array_equal(totals, [3., nan, nan, 5.])
+    np.testing.assert_array_equal(mask, [True, False, False, True])
+
+def reference(data, all_old):
+    '''Combined data of New Trust worked out directly from its rows'''
+    new, old = data[1], data[2:4]
+    totals = np.nan_to_num(new) + np.nan_to_num(old).sum(axis = 0)
+    reported = ~np.isnan(old)
+    if all_old:
+        mask = ~np.isnan(new) | reported.all(axis = 0)
+    else:
+        mask = ~np.isnan(new) | reported.any(axis = 0)
+    totals[~mask] = nan
+    return totals, mask
+
+def test_combine_random_data(matrix):
+    rng = np.random.default_rng(1)
+    data = rng.uniform(0, 100, (len(names), 30))
+    data[rng.uniform(size = data.shape) < 0.3] = nan
+
+    for all_old in [True, False]:
+        totals, mask = matrix.combine(data, all_old)["New Trust"]
+        expected_totals, expected_mask = reference(data, all_old)
+        np.testing.assert_allclose(totals, expected_totals)
+        np.testing.assert_array_equal(mask, expected_mask)
+
+def test_bed_change_without_merged_data():
+    # the merged data is made with a MergeMatrix when it isn't given
+    beds = np.array([[100., 90.], [nan, 150.], [40., nan], [30., nan],
+                     [85., 80.]])
+    changes = proc.bed_change_per_trust(names, beds, mergers)
+    merged = proc.MergeMatrix(mergers, proc.name_index(names)).combine(beds)
+    assert changes == proc.bed_change_per_trust(names, beds, mergers, merged)
+    # newest first: New Trust went from 150 to 70 beds and Other Trust
+    # from 80 to 85
+    assert changes == (0, 50, 50)
+
+def test_dataset_merged_is_cached():
+    dataset = Dataset(np.asarray(names, dtype = object), ["01/2020", "02/2020", "03/2020", "04/2020"],
+                      values, mergers = mergers)
+    assert dataset.merged(2) is dataset.merged(2)
+    np.testing.assert_array_equal(dataset.merged(2)["New Trust"][0],
+                                  [3., 2., 3., 5.])
@@ -0,0 +1,77 @@
+import os
+import zipfile
+import pytest
+
+from build_website import ods
+
+content = '''<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content
+ xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+ xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+ xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+ xmlns:xlink="http://www.w3.org/1999/xlink">
+<office:body><office:spreadsheet>
+<table:table table:name="First">
+ <table:table-row>
+  <table:table-cell office:value-type="string"><text:p>Trust</text:p></table:table-cell>
+  <table:table-cell table:number-columns-repeated="2"/>
+  <table:table-cell office:value-type="float" office:value="3.5"><text:p>3.5</text:p></table:table-cell>
+ </table:table-row>
+ <table:table-row table:number-rows-repeated="2">
+  <table:table-cell office:value-type="date" office:date-value="2020-05-01"><text:p>01/05/20</text:p></table:table-cell>
+  <table:table-cell office:value-type="string"><text:p>a<text:s text:c="2"/>b <text:a xlink:href="https://example.com">link</text:a></text:p><text:p>second</text:p></table:table-cell>
+ </table:table-row>
+ <table:table-row table:number-rows-repeated="3"><table:table-cell/></table:table-row>
+ <table:table-row>
+  <table:table-cell office:value-type="boolean" office:boolean-value="true"><text:p>TRUE</text:p></table:table-cell>
+  <table:table-cell table:number-columns-repeated="1000"/>
+ </table:table-row>
+ <table:table-row table:number-rows-repeated="1048570"><table:table-cell table:number-columns-repeated="1024"/></table:table-row>
+</table:table>
+<table:table table:name="Second">
+ <table:table-row>
+  <table:table-cell office:value-type="string"><text:p>second sheet</text:p></table:table-cell>
+ </table:table-row>
+</table:table>
+</office:spreadsheet></office:body>
+</office:document-content>
+'''
+
+@pytest.fixture
+def sheet(tmp_path):
+    path = str(tmp_path/"sheet.ods")
+    with zipfile.ZipFile(path, "w") as file:
+        file.writestr("content.xml", content)
+    return path
+
+def test_read_sheet(sheet):
+    # the empty third column is dropped
+    assert ods.read_sheet(sheet) == [
+        ["Trust", None, 3.5],
+        ["2020-05-01", "a  b link\nsecond", None],
+        ["2020-05-01", "a  b link\nsecond", None],
+        [None, None, None],
+        [None, None, None],
+        [None, None, None],
+        [True, None, None],
+        ]
+
+def test_iter_rows_keeps_empty_cells(sheet):
+    rows = list(ods.iter_rows(sheet))
+    assert rows[0] == ["Trust", None, None, 3.5]
+    assert len(rows) == 7
+
+def test_other_sheet(sheet):
+    assert ods.read_sheet(sheet, 2) == [["second sheet"]]
+
+def test_matches_read_ods():
+    pandas_ods_reader = pytest.importorskip("pandas_ods_reader")
+    import pandas as pd
+
+    path = os.path.join(os.path.dirname(__file__), os.pardir, "data",
+                        "NHS_news_items.ods")
+    expected = pandas_ods_reader.read_ods(path, 1, headers = False).values
+    # newer pandas gives NaN rather than None for empty cells
+    expected = [[None if pd.isna(value) else value for value in row]
+                for row in expected.tolist()]
+    assert ods.read_sheet(path) == expected
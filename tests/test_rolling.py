@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+import build_website.rolling as rolling
+
+nan = np.nan
+
+def test_trailing():
+    out = rolling.rolling_sum([1., 2., 3., 4.], 2)
+    np.testing.assert_array_equal(out, [nan, 3., 5., 7.])
+
+def test_centred():
+    np.testing.assert_array_equal(rolling.rolling_sum([1., 2., 3., 4.], 3,
+                                                      window = "centred"),
+                                  [nan, 6., 9., nan])
+    # even windows are placed just before the middle
+    np.testing.assert_array_equal(rolling.rolling_sum([1., 2., 3., 4.], 2,
+                                                      window = "centred"),
+                                  [3., 5., 7., nan])
+
+def test_skip_gaps():
+    values = [1., nan, 2., 3., nan, nan, 4.]
+    out = rolling.rolling_sum(values, 2)
+    np.testing.assert_array_equal(out, [nan, nan, 3., 5., nan, nan, 7.])
+    out = rolling.rolling_sum(values, 3, window = "centred")
+    np.testing.assert_array_equal(out, [nan, nan, 6., 9., nan, nan, nan])
+
+def test_skip_gaps_matches_smoothing_the_valid_points():
+    rng = np.random.default_rng(2)
+    values = rng.uniform(0, 10, 40)
+    values[rng.uniform(size = 40) < 0.3] = nan
+    valid = ~np.isnan(values)
+    out = rolling.rolling_mean(values, 3)
+    smooth = np.convolve(values[valid], np.ones(3)/3, 'valid')
+    np.testing.assert_allclose(out[valid][2:], smooth)
+    assert np.isnan(out[~valid]).all()
+
+def test_propagate_gaps():
+    values = [1., nan, 2., 3., 4.]
+    np.testing.assert_array_equal(rolling.rolling_sum(values, 2,
+                                                      gaps = "propagate"),
+                                  [nan, nan, nan, 5., 7.])
+
+def test_rows_are_independent():
+    rng = np.random.default_rng(3)
+    values = rng.uniform(0, 10, (4, 20))
+    values[rng.uniform(size = values.shape) < 0.3] = nan
+    out = rolling.rolling_sum(values, 4, window = "centred")
+    for row, result in zip(values, out):
+        np.testing.assert_array_equal(result, rolling.rolling_sum(
+            row, 4, window = "centred"))
+
+def test_window_longer_than_data():
+    assert np.isnan(rolling.rolling_sum([1., 2.], 3)).all()
+
+def test_unknown_options():
+    with pytest.raises(ValueError):
+        rolling.rolling_sum([1., 2.], 2, window = "leading")
+    with pytest.raises(ValueError):
+        rolling.rolling_sum([1., 2.], 2, gaps = "fill")
+
+def test_first_and_last_valid():
+    values = np.array([[nan, 1., 2., nan], [nan, nan, nan, nan]])
+    np.testing.assert_array_equal(rolling.first_valid(values), [1., nan])
+    np.testing.assert_array_equal(rolling.last_valid(values), [2., nan])
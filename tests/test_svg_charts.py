@@ -0,0 +1,96 @@
+import json
+import numpy as np
+import pytest
+import xml.etree.ElementTree as ET
+
+from build_website import svg_charts
+from build_website.chart_data import jsonSpec
+from tests.conftest import trust_names
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+def parse(svg):
+    root = ET.fromstring(svg.encode("utf-8"))
+    assert root.tag == SVG + "svg"
+    return root
+
+def marks(root, tag):
+    '''Number of tag elements in each group of data marks'''
+    return [len(group.findall(SVG + tag)) for group in root.iter(SVG + "g")]
+
+def test_waiting_chart(data):
+    name = trust_names[1]
+    waiting = data.waiting[3]
+    waiting[data.waiting.rows[name], :4] = np.nan
+
+    root = parse(svg_charts.makeChart("waiting", name, data))
+    assert marks(root, "circle") == [20]
+    lines = list(root.iter(SVG + "polyline"))
+    assert len(lines) == 1
+    # a 3 month average of the 20 reported months
+    assert len(lines[0].get("points").split()) == 18
+    # under a thousand waiting, so no units
+    label = "".join(span.text for span in root.iter(SVG + "tspan"))
+    assert label == "People waiting over 4 hours"
+
+def test_beds_chart(data):
+    name = trust_names[2]
+    data.beds[2][data.beds.rows[name], -3:] = np.nan
+
+    root = parse(svg_charts.makeChart("beds", name, data))
+    # the axis is broken, so the bars are drawn in both frames
+    assert marks(root, "rect") == [21, 21]
+
+def test_covid_chart(data):
+    name = trust_names[0]
+    deaths = data.covid[2][data.covid.rows[name]]
+
+    root = parse(svg_charts.makeChart("covid", name, data))
+    assert marks(root, "circle") == [len(deaths)]
+    # a centred weekly average, leaving out the last 3 days
+    line = root.find(SVG + "polyline")
+    assert len(line.get("points").split()) == len(deaths) - 6 - 3
+
+def test_unknown_chart(data):
+    with pytest.raises(ValueError):
+        svg_charts.makeChart("news", trust_names[0], data)
+
+def spec():
+    frame = svg_charts.Frame(50, 400, 10, 250, (0, 4), (0, 10))
+    layers = [{"type": "points", "x": [1, 2, 3], "y": [2, 4, 6]},
+              {"type": "line", "x": [1, 3], "y": [3, 5], "colour": "#e60000"},
+              {"type": "bars", "x": [1, 2], "height": [5, 0], "bottom": 0,
+               "width": 0.5, "colour": "#0072CE"}]
+    return {"frames": [svg_charts.frame_spec(frame, layers)],
+            "xaxis": {"ticks": [0, 2, 4, 6], "labels": ["a", "b", "c", "d"],
+                      "rotation": 0},
+            "ylabel": {"text": "Two\nlines", "x": 20},
+            "legend": {"entries": [("line", "#e60000", "Average")],
+                       "loc": "upper left"}}
+
+def test_render():
+    root = parse(svg_charts.render(spec()))
+    # bars of no height aren't drawn
+    assert marks(root, "circle") == [3, 0]
+    assert marks(root, "rect") == [0, 1]
+    assert root.find(SVG + "polyline").get("points") == "137.5,178 312.5,130"
+    texts = ["".join(text.itertext()) for text in root.iter(SVG + "text")]
+    # the tick at 6 is outside the chart
+    assert texts[-5:-2] == ["a", "b", "c"]
+    assert texts[-2:] == ["Twolines", "Average"]
+
+def test_render_unknown_layer():
+    chart = spec()
+    chart["frames"][0]["layers"].append({"type": "pie"})
+    with pytest.raises(ValueError):
+        svg_charts.render(chart)
+
+def test_chart_spec_as_json(data):
+    # the browser draws the charts from the rounded JSON specs, which can
+    # move a coordinate by 0.1 pt but draw the same marks
+    for kind in ["waiting", "beds", "covid"]:
+        chart = svg_charts.chartSpec(kind, trust_names[1], data)
+        copy = json.loads(json.dumps(jsonSpec(chart)))
+        tags = [[element.tag for element in parse(svg_charts.render(spec))
+                 .iter()] for spec in (copy, chart)]
+        assert tags[0] == tags[1]
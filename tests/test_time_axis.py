@@ -0,0 +1,33 @@
+from datetime import date
+import numpy as np
+
+from build_website.process_data import TimeAxis
+
+def test_month_strings():
+    dates = ["11/2019", "12/2019", "01/2020"]
+    axis = TimeAxis(dates)
+    assert axis.dates is dates
+    np.testing.assert_array_equal(axis.times, np.array(
+        ["2019-11", "2019-12", "2020-01"], dtype = "datetime64[M]"))
+    # year + month/12
+    np.testing.assert_allclose(axis.years, [2019 + 11/12, 2020.0, 2020 + 1/12])
+
+def test_fractional_years():
+    # year + month/12, so December is the end of the year
+    axis = TimeAxis([2019 + 11/12, 2020.0, 2020.25])
+    np.testing.assert_array_equal(axis.times, np.array(
+        ["2019-11", "2019-12", "2020-03"], dtype = "datetime64[M]"))
+    np.testing.assert_allclose(axis.years, [2019 + 11/12, 2020.0, 2020.25])
+
+def test_days():
+    days = np.array(["2020-01-01", "2020-07-02"], dtype = "datetime64[D]")
+    axis = TimeAxis(days)
+    np.testing.assert_array_equal(axis.times, days)
+    np.testing.assert_allclose(axis.years, [2020.0, 2020 + 183/366])
+
+def test_date_objects():
+    # the pickled covid data holds datetime.date objects
+    days = np.array([date(2020, 3, 1), date(2020, 3, 2)], dtype = object)
+    axis = TimeAxis(days)
+    assert axis.times.dtype == np.dtype("datetime64[D]")
+    np.testing.assert_allclose(np.diff(axis.years), [1/366])
@@ -0,0 +1,56 @@
+import os
+import pytest
+
+import build_website.workers as workers
+import build_website.plot_data as pd
+import build_website.build_website as bw
+from tests.conftest import trust_names
+
+def saved_files(folder):
+    charts = {}
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as file:
+                charts[name] = file.read()
+    return charts
+
+@pytest.mark.parametrize("method", ["spawn", "fork"])
+def test_render_charts_in_pool(data, tmp_path, monkeypatch, method):
+    if method not in workers.multiprocessing.get_all_start_methods():
+        pytest.skip("{} isn't available".format(method))
+    charts = [(kind, name) for kind in ["waiting", "beds", "covid"]
+              for name in trust_names]
+
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("figures")
+    assert pd.renderCharts(data, charts, jobs = 1, backend = "native") == []
+    serial = saved_files("figures")
+
+    for name in serial:
+        os.remove(os.path.join("figures", name))
+    monkeypatch.setattr(workers, "start_method", method)
+    assert pd.renderCharts(data, charts, jobs = 2, backend = "native") == []
+    assert saved_files("figures") == serial
+    assert len(serial) == len(charts)
+
+news_file = os.path.join(os.path.dirname(__file__), "..", "data",
+                         "NHS_news_items.ods")
+
+@pytest.mark.parametrize("method", ["spawn", "fork"])
+def test_build_trust_pages_in_pool(data, tmp_path, monkeypatch, method):
+    if method not in workers.multiprocessing.get_all_start_methods():
+        pytest.skip("{} isn't available".format(method))
+    news = os.path.abspath(news_file)
+
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("hospitals")
+    bw.build_trust_pages(data, news, jobs = 1)
+    serial = saved_files("hospitals")
+
+    for name in serial:
+        os.remove(os.path.join("hospitals", name))
+    monkeypatch.setattr(workers, "start_method", method)
+    bw.build_trust_pages(data, news, jobs = 2)
+    assert saved_files("hospitals") == serial
+    assert len(serial) == len(trust_names)